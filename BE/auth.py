@@ -1,19 +1,134 @@
+import os
+import time
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 import models
+from concurrency import BoundedExecutor
 
 # JWT Configuration
 SECRET_KEY = "your-secret-key"  # Change this to a secure secret key in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 2400
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor. Hashes made with a different cost are upgraded
+# (or downgraded) transparently on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+# bcrypt takes 100ms+ of CPU per call, so async handlers run it on a
+# small pool (bcrypt releases the GIL) instead of the event loop
+password_executor = BoundedExecutor(
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_queue=int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", "64")),
+    queue_timeout=float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "10")),
+    name="bcrypt"
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Same scheme for endpoints that also serve anonymous callers
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+# Resolved users are cached by token subject so authenticated requests do
+# not pay a user lookup each; AUTH_USER_CACHE_TTL=0 disables the cache
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+
+class UserCache:
+    """
+    TTL + LRU cache of users keyed by email (the token subject).
+
+    Cached users are detached from their session, so only their loaded
+    column attributes are available. Entries are invalidated whenever a
+    user row is changed or deleted through the ORM, see the listeners below.
+    """
+
+    def __init__(self, max_size=AUTH_USER_CACHE_SIZE, ttl_seconds=AUTH_USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._users = OrderedDict()  # email -> (user, expires at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email):
+        with self._lock:
+            entry = self._users.get(email)
+            if entry is not None and entry[1] > time.monotonic():
+                self._users.move_to_end(email)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._users[email]
+            self.misses += 1
+            return None
+
+    def put(self, email, user):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._users[email] = (user, time.monotonic() + self.ttl_seconds)
+            self._users.move_to_end(email)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+    def invalidate(self, email=None):
+        """Drop one user, or every user when ``email`` is None."""
+        with self._lock:
+            if email is None:
+                self._users.clear()
+            else:
+                self._users.pop(email, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._users),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+user_cache = UserCache()
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def invalidate_cached_user(mapper, connection, target):
+    # Current and previous email, in case the subject itself changed
+    emails = {target.email, *inspect(target).attrs.email.history.deleted}
+    for email in emails:
+        user_cache.invalidate(email)
+    # Invalidate again on commit, in case a request re-cached the old row
+    # between this flush and the commit
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("stale_user_emails", set()).update(emails)
+
+@event.listens_for(Session, "after_commit")
+def invalidate_committed_users(session):
+    for email in session.info.pop("stale_user_emails", ()):
+        user_cache.invalidate(email)
+
+@event.listens_for(Session, "do_orm_execute")
+def invalidate_bulk_user_changes(orm_execute_state):
+    # query(User).update()/delete() bypass the mapper events above
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) \
+            and orm_execute_state.bind_mapper is inspect(models.User):
+        user_cache.invalidate()
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -32,6 +147,27 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     return user
 
+async def hash_password(password):
+    """get_password_hash on the password pool."""
+    return await password_executor.run(get_password_hash, password)
+
+async def authenticate_user_async(db: Session, username: str, password: str):
+    """
+    authenticate_user with verification on the password pool. Stored
+    hashes whose cost differs from BCRYPT_ROUNDS are replaced after a
+    successful login.
+    """
+    user = get_user(db, username)
+    if not user:
+        return False
+    valid, new_hash = await password_executor.run(pwd_context.verify_and_update, password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+    return user
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -56,12 +192,26 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = models.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = get_user(db, username=token_data.username)
+    user = user_cache.get(token_data.username)
     if user is None:
-        raise credentials_exception
+        user = get_user(db, username=token_data.username)
+        if user is None:
+            raise credentials_exception
+        db.expunge(user)
+        user_cache.put(token_data.username, user)
     return user
 
 async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+async def get_optional_current_user(token: Optional[str] = Depends(optional_oauth2_scheme), db: Session = Depends(models.get_db)):
+    """Return the authenticated active user, or None for anonymous or invalid tokens."""
+    if not token:
+        return None
+    try:
+        user = await get_current_user(token, db)
+    except HTTPException:
+        return None
+    return user if user.is_active else None
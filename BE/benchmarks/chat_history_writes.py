@@ -0,0 +1,176 @@
+"""
+Benchmark concurrent chat-history writes under different database setups.
+
+Each writer thread repeats what POST /chat/history does: look up the
+session, insert a ChatHistory row, bump the session's last_updated and
+commit. Reader threads meanwhile page through chat history, as the
+frontend does when a session is opened. Run from the BE directory:
+
+    python -m benchmarks.chat_history_writes --writers 1 4 16 --writes 200
+
+By default the previous SQLite setup (rollback journal, synchronous=FULL)
+is compared with the WAL configuration on temporary database files. Pass
+--url to run against another database instead, e.g. PostgreSQL.
+"""
+import os
+import json
+import time
+import tempfile
+import argparse
+import threading
+from datetime import datetime
+import numpy as np
+
+# Keep the application's own database out of the benchmark
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, ChatSession, ChatHistory, create_db_engine
+
+SQLITE_CONFIGS = {
+    "rollback_journal": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "wal": {"journal_mode": "WAL", "synchronous": "NORMAL"},
+}
+
+
+def seed(Session, n_sessions):
+    db = Session()
+    try:
+        # Unique per run, since a server database keeps earlier runs' users
+        email = f"bench-{time.time_ns()}@example.com"
+        user = User(username=email, email=email, hashed_password="x")
+        db.add(user)
+        db.commit()
+        sessions = [ChatSession(user_id=user.id, topic=f"bench {i}") for i in range(n_sessions)]
+        db.add_all(sessions)
+        db.commit()
+        return user.id, [session.id for session in sessions]
+    finally:
+        db.close()
+
+
+def write_history(Session, user_id, session_id, i):
+    db = Session()
+    try:
+        session = db.query(ChatSession)\
+            .filter(ChatSession.id == session_id, ChatSession.user_id == user_id)\
+            .first()
+        db.add(ChatHistory(session_id=session_id, user_id=user_id,
+                           message=f"message {i}", response=f"response {i}"))
+        session.last_updated = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+def read_history(Session, session_id):
+    db = Session()
+    try:
+        db.query(ChatHistory)\
+            .filter(ChatHistory.session_id == session_id)\
+            .order_by(ChatHistory.timestamp.desc())\
+            .limit(20)\
+            .all()
+    finally:
+        db.close()
+
+
+def run(engine, n_writers, n_writes, n_readers, n_sessions):
+    """Run one configuration and return throughput and latency figures."""
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    user_id, session_ids = seed(Session, n_sessions)
+
+    latencies, errors, reads = [], [], [0]
+    lock = threading.Lock()
+    writing = threading.Event()
+    writing.set()
+
+    def writer(w):
+        for i in range(n_writes):
+            session_id = session_ids[(w + i) % len(session_ids)]
+            start = time.perf_counter()
+            try:
+                write_history(Session, user_id, session_id, i)
+            except Exception as e:
+                with lock:
+                    errors.append(type(e).__name__)
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    def reader(r):
+        i = 0
+        while writing.is_set():
+            read_history(Session, session_ids[(r + i) % len(session_ids)])
+            i += 1
+        with lock:
+            reads[0] += i
+
+    readers = [threading.Thread(target=reader, args=(r,)) for r in range(n_readers)]
+    writers = [threading.Thread(target=writer, args=(w,)) for w in range(n_writers)]
+    for thread in readers:
+        thread.start()
+    start = time.perf_counter()
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    writing.clear()
+    for thread in readers:
+        thread.join()
+    engine.dispose()
+
+    written = len(latencies)
+    latencies = np.asarray(latencies) if latencies else np.zeros(1)
+    return {
+        "writers": n_writers,
+        "readers": n_readers,
+        "writes": written,
+        "errors": len(errors),
+        "writes_per_s": written / elapsed,
+        "reads_per_s": reads[0] / elapsed,
+        "write_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p99": float(np.percentile(latencies, 99)),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent chat history writes")
+    parser.add_argument("--url", default=None, help="Database URL; default compares SQLite setups on temp files")
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--writes", type=int, default=200, help="Writes per writer thread")
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--output", default="chat_history_bench.json")
+    args = parser.parse_args()
+
+    if args.url:
+        # Server databases keep their data, so use them for a single setup only
+        setups = [("url", lambda path: create_db_engine(args.url))]
+    else:
+        setups = [(name, lambda path, config=config: create_db_engine(f"sqlite:///{path}", **config))
+                  for name, config in SQLITE_CONFIGS.items()]
+
+    runs = []
+    for name, make_engine in setups:
+        for n_writers in args.writers:
+            with tempfile.TemporaryDirectory() as tmp:
+                engine = make_engine(os.path.join(tmp, "bench.db"))
+                result = run(engine, n_writers, args.writes, args.readers, args.sessions)
+            result["setup"] = name
+            runs.append(result)
+            print(f"{name:<18} writers={n_writers:<3} writes/s={result['writes_per_s']:8.1f} "
+                  f"reads/s={result['reads_per_s']:8.1f} p50={result['write_ms']['p50']:7.2f}ms "
+                  f"p99={result['write_ms']['p99']:7.2f}ms errors={result['errors']}")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "runs": runs}, f, indent=2)
+    print(f"Benchmark report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
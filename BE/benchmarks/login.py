@@ -0,0 +1,119 @@
+"""
+Login throughput benchmark: bcrypt verification inline on the event loop
+(the previous /signin behaviour, authenticate_user) versus on the
+password pool (authenticate_user_async).
+
+Concurrent logins run as asyncio tasks while a probe task measures how
+late the event loop wakes it up, which is the delay every other request
+sees during a login storm. Run from the BE directory:
+
+    BCRYPT_ROUNDS=12 python -m benchmarks.login --concurrency 1 8 32 --logins 64
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+
+# Keep the application's own database out of the benchmark
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import auth
+from models import SessionLocal, User
+
+PASSWORD = "benchmark-password"
+
+
+def seed_users(n_users):
+    """Create users sharing one password hash; returns their emails."""
+    hashed = auth.get_password_hash(PASSWORD)
+    emails = [f"login-bench-{time.time_ns()}-{i}@example.com" for i in range(n_users)]
+    db = SessionLocal()
+    try:
+        db.add_all([User(username=email, email=email, hashed_password=hashed) for email in emails])
+        db.commit()
+    finally:
+        db.close()
+    return emails
+
+
+async def login(email, pooled):
+    db = SessionLocal()
+    try:
+        if pooled:
+            user = await auth.authenticate_user_async(db, email, PASSWORD)
+        else:
+            user = auth.authenticate_user(db, email, PASSWORD)
+        assert user, "login failed"
+    finally:
+        db.close()
+
+
+async def probe_loop_lag(lags, stop, interval=0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def run(emails, concurrency, pooled):
+    """Run one login per email with ``concurrency`` logins in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, lags = [], []
+    stop = asyncio.Event()
+
+    async def one(email):
+        async with semaphore:
+            start = time.perf_counter()
+            await login(email, pooled)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    probe = asyncio.create_task(probe_loop_lag(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[one(email) for email in emails])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+
+    lags = lags or [0.0]
+    return {
+        "mode": "pool" if pooled else "inline",
+        "concurrency": concurrency,
+        "logins": len(emails),
+        "logins_per_s": len(emails) / elapsed,
+        "login_ms": {"p50": float(np.percentile(latencies, 50)), "p99": float(np.percentile(latencies, 99))},
+        "loop_lag_ms": {"p50": float(np.percentile(lags, 50)), "max": float(np.max(lags))},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark login throughput")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--logins", type=int, default=64, help="Logins per run")
+    parser.add_argument("--output", default="login_bench.json")
+    args = parser.parse_args()
+
+    emails = seed_users(args.logins)
+    runs = []
+    for pooled in (False, True):
+        for concurrency in args.concurrency:
+            result = asyncio.run(run(emails, concurrency, pooled))
+            runs.append(result)
+            print(f"{result['mode']:<7} concurrency={concurrency:<3} logins/s={result['logins_per_s']:7.1f} "
+                  f"login p50={result['login_ms']['p50']:8.1f}ms p99={result['login_ms']['p99']:8.1f}ms  "
+                  f"loop lag p50={result['loop_lag_ms']['p50']:7.1f}ms max={result['loop_lag_ms']['max']:8.1f}ms")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "bcrypt_rounds": auth.BCRYPT_ROUNDS,
+        "workers": auth.password_executor.max_workers,
+        "runs": runs,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
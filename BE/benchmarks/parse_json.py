@@ -0,0 +1,114 @@
+"""
+Micro-benchmark: JSON extraction from LLM outputs, the previous regex
+triple-parse versus the single-pass scanner in crew/json_parser.py.
+
+Run from the BE directory:
+
+    python -m benchmarks.parse_json --repeat 2000
+
+The corpus (llm_outputs.jsonl) is synthetic: hand-written outputs in the
+shapes the chatbot sees (raw and fenced JSON, JSON wrapped in prose, a
+tool-call trace, braces inside strings, plain-text answers and a bare
+array), with titles and place_ids taken from vector_mapping.csv. It is
+not a capture of real crew runs; replace it with one to measure those. The scaling
+section times prose with stray "{" characters at growing lengths, where
+the greedy regex backtracks, and runs of unclosed braces ending in an
+unterminated string, which must not make the scanner rescan per brace.
+"""
+import os
+import re
+import json
+import time
+import argparse
+
+from crew.json_parser import extract_json, is_suggestions_payload
+
+DEFAULT_CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_outputs.jsonl")
+
+
+def legacy_parse(response):
+    """The regex-based parser previously in crew/chatbot.py, for comparison."""
+    try:
+        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', response)
+        if json_match:
+            return json.loads(json_match.group(1))
+    except ValueError:
+        pass
+    try:
+        json_match = re.search(r'(\{[\s\S]*\})', response)
+        if json_match:
+            return json.loads(json_match.group(1))
+    except ValueError:
+        pass
+    try:
+        return json.loads(response)
+    except ValueError:
+        return None
+
+
+PARSERS = {
+    "legacy_regex": legacy_parse,
+    "scanner": extract_json,
+    "scanner_validated": lambda text: extract_json(text, is_suggestions_payload),
+}
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def time_parser(parse, texts, repeat):
+    """Mean microseconds per call over ``repeat`` passes of ``texts``."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            parse(text)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+
+def describe(result):
+    if result is None:
+        return "none"
+    if isinstance(result, dict):
+        return "suggestions" if is_suggestions_payload(result) else "object"
+    return type(result).__name__
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM output JSON extraction")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_PATH)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    print(f"{'sample':<24}" + "".join(f"{name:>24}" for name in PARSERS))
+    for item in corpus:
+        row = [f"{describe(parse(item['output'])):>10} {time_parser(parse, [item['output']], args.repeat):7.1f}us"
+               for parse in PARSERS.values()]
+        print(f"{item['name']:<24}" + "".join(f"{cell:>24}" for cell in row))
+
+    texts = [item["output"] for item in corpus]
+    totals = {name: time_parser(parse, texts, args.repeat) for name, parse in PARSERS.items()}
+    print("mean per output: " + ", ".join(f"{name}={us:.1f}us" for name, us in totals.items()))
+
+    print("\nprose with stray '{' characters:")
+    for size in args.sizes:
+        text = ("see {note " * (size // 10 + 1))[:size]
+        repeat = max(1, args.repeat * 100 // size)
+        timings = ", ".join(f"{name}={time_parser(parse, [text], repeat):.1f}us"
+                            for name, parse in PARSERS.items())
+        print(f"  {size:>7} chars: {timings}")
+
+    print("\nunclosed braces before an unterminated string:")
+    for size in args.sizes:
+        text = "{" * (size - 1) + '"'
+        repeat = max(1, args.repeat * 100 // size)
+        timings = ", ".join(f"{name}={time_parser(parse, [text], repeat):.1f}us"
+                            for name, parse in PARSERS.items())
+        print(f"  {size:>7} chars: {timings}")
+
+
+if __name__ == "__main__":
+    main()
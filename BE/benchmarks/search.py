@@ -0,0 +1,140 @@
+"""
+Recommender benchmark: recall@k, encode/search latency percentiles and QPS.
+
+Run from the BE directory:
+
+    python -m benchmarks.search --k 1 5 10 --concurrency 1 4 --output search_bench.json
+
+The query set is JSONL with one {"query": ..., "relevant": [place_id, ...]}
+object per line ("relevant" is optional) or a plain text file with one
+query per line. Recall is only reported over labelled queries.
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from search_engine import get_engine, DEFAULT_INDEX_PATH, DEFAULT_MAPPING_PATH, DEFAULT_MODEL_NAME
+
+DEFAULT_QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_queries.jsonl")
+
+
+def load_queries(path):
+    """Load a query set as a list of {"query": str, "relevant": list or None}."""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+                queries.append({"query": item["query"], "relevant": item.get("relevant")})
+            else:
+                queries.append({"query": line, "relevant": None})
+    return queries
+
+
+def percentiles(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+    }
+
+
+def run_one(engine, item, k, mode):
+    """Run one query, timing encode and search separately."""
+    start = time.perf_counter()
+    query_vectors = engine.encode_batch([item["query"]])
+    encoded = time.perf_counter()
+    results = engine.search_vectors([item["query"]], query_vectors, k, mode)[0]
+    done = time.perf_counter()
+    return (encoded - start) * 1000, (done - encoded) * 1000, results
+
+
+def recall_at_k(results, relevant, k):
+    found = {result.get("place_id") for result in results[:k]}
+    return len(found & set(relevant)) / float(min(len(relevant), k))
+
+
+def run_benchmark(engine, queries, k, concurrency, mode=None, repeat=1, warm_cache=False):
+    """Run the query set ``repeat`` times with ``concurrency`` threads."""
+    if not warm_cache:
+        engine.embedding_cache.clear()
+    workload = queries * repeat
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = list(pool.map(lambda item: run_one(engine, item, k, mode), workload))
+    elapsed = time.perf_counter() - start
+
+    encode_ms = [t[0] for t in timings]
+    search_ms = [t[1] for t in timings]
+    recalls = [recall_at_k(results, item["relevant"], k)
+               for item, (_, _, results) in zip(workload, timings) if item["relevant"]]
+    return {
+        "k": k,
+        "concurrency": concurrency,
+        "queries": len(workload),
+        "recall_at_k": float(np.mean(recalls)) if recalls else None,
+        "labelled_queries": len(recalls),
+        "encode_ms": percentiles(encode_ms),
+        "search_ms": percentiles(search_ms),
+        "total_ms": percentiles([e + s for e, s in zip(encode_ms, search_ms)]),
+        "qps": len(workload) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the location recommender")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES_PATH, help="JSONL or text query set")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--mapping", default=DEFAULT_MAPPING_PATH)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--mode", choices=["hybrid", "vector"], default=None)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Passes over the query set per run; later passes hit the embedding cache")
+    parser.add_argument("--warm-cache", action="store_true", help="Keep the embedding cache between runs")
+    parser.add_argument("--output", default="search_bench.json")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    engine = get_engine(args.index, args.mapping, args.model).load()
+    # Warm-up so model and index initialization is not measured
+    engine.search_batch([item["query"] for item in queries[:1]], 1, args.mode)
+
+    runs = []
+    for k in args.k:
+        for concurrency in args.concurrency:
+            run = run_benchmark(engine, queries, k, concurrency, args.mode, args.repeat, args.warm_cache)
+            runs.append(run)
+            recall = "n/a" if run["recall_at_k"] is None else f"{run['recall_at_k']:.3f}"
+            print(f"k={k:<3} threads={concurrency:<3} recall={recall:<6} "
+                  f"encode p50={run['encode_ms']['p50']:.2f}ms p99={run['encode_ms']['p99']:.2f}ms  "
+                  f"search p50={run['search_ms']['p50']:.2f}ms p99={run['search_ms']['p99']:.2f}ms  "
+                  f"qps={run['qps']:.1f}")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "index_path": args.index,
+        "index_type": type(engine.index).__name__,
+        "ntotal": int(engine.index.ntotal),
+        "mode": args.mode or "default",
+        "model": args.model,
+        "query_set": args.queries,
+        "runs": runs,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from metrics import STAGE_SECONDS
+
+# Chat processing limits: concurrent LLM calls, requests allowed to wait
+# for a worker, and how long a request may wait before it is dropped
+CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", "4"))
+CHAT_QUEUE_DEPTH = int(os.getenv("CHAT_QUEUE_DEPTH", "16"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "30"))
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a job cannot be accepted or waited too long for a worker."""
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a bounded queue for blocking work called from async
+    endpoints.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue``
+    more wait for a worker. Further submissions are rejected with 429
+    straight away, and queued jobs that wait longer than ``queue_timeout``
+    seconds are dropped with 503, instead of piling up behind slow LLM
+    calls. Both errors carry a Retry-After estimate.
+    """
+
+    def __init__(self, max_workers=CHAT_WORKERS, max_queue=CHAT_QUEUE_DEPTH,
+                 queue_timeout=CHAT_QUEUE_TIMEOUT, name="worker", window=1000):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._queue_wait_ms = deque(maxlen=window)
+        self._service_ms = deque(maxlen=window)
+
+    async def run(self, fn, *args):
+        """Run ``fn(*args)`` on a worker thread and return its result."""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturated("Too many requests in progress", 429, self.retry_after())
+            self._pending += 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, self._call, time.perf_counter(), fn, args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _call(self, enqueued, fn, args):
+        started = time.perf_counter()
+        waited = started - enqueued
+        # Also exported on /metrics, e.g. stage="chat_queue_wait"
+        STAGE_SECONDS.observe(waited, stage=f"{self.name}_queue_wait")
+        with self._lock:
+            self._queue_wait_ms.append(waited * 1000)
+            if waited > self.queue_timeout:
+                self._timed_out += 1
+                raise ExecutorSaturated("Request waited too long for a worker", 503, self.retry_after())
+            self._running += 1
+
+        failed = False
+        try:
+            return fn(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._service_ms.append((time.perf_counter() - started) * 1000)
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+
+    def retry_after(self):
+        """Seconds until a worker is likely free, from recent service times."""
+        if not self._service_ms:
+            return 1
+        queued = max(self._pending - self.max_workers, 0)
+        rounds = queued / self.max_workers + 1
+        return max(1, math.ceil(float(np.mean(self._service_ms)) / 1000 * rounds))
+
+    def stats(self):
+        with self._lock:
+            queue_wait = list(self._queue_wait_ms)
+            service = list(self._service_ms)
+            stats = {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_timeout_s": self.queue_timeout,
+                "running": self._running,
+                "queued": max(self._pending - self._running, 0),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+            }
+        stats["queue_wait_ms"] = _summary(queue_wait)
+        stats["service_ms"] = _summary(service)
+        return stats
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls made from the event loop.
+
+    The first caller for a key starts the work; callers arriving while it
+    is in flight await the same task and receive the same result (or
+    exception). The shared task is shielded, so a disconnecting client
+    does not cancel the work for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def run(self, key, fn, *args):
+        """Await ``fn(*args)`` (a coroutine function), sharing it per ``key``."""
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executed += 1
+            task = asyncio.ensure_future(fn(*args))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every waiter went away
+            task.exception()
+
+    def stats(self):
+        calls = self.executed + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": self.coalesced / calls if calls else 0.0,
+        }
+
+
+def _summary(values):
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p99": 0.0}
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "count": int(len(values)),
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p99": float(np.percentile(values, 99)),
+    }
@@ -18,8 +18,8 @@ llm = ChatGoogleGenerativeAI(
     google_api_key=os.getenv("GOOGLE_API_KEY")
 )
 
-# Create an agent that will serve as your chatbot
-chatbot = Agent(
+# Settings of the chatbot agent, shared by every agent built from them
+CHATBOT_AGENT_CONFIG = dict(
     role="Travel Planning Assistant",
     goal="""Help users plan trips and suggest locations based on their descriptions.
         When suggesting locations, analyze the user's description carefully and use the location tool
@@ -46,3 +46,10 @@ chatbot = Agent(
         Dont add any thing extra other than this JSON object.""",
     
 )
+
+def create_chatbot_agent():
+    """Build a new chatbot agent; each crew in the pool gets its own."""
+    return Agent(**CHATBOT_AGENT_CONFIG)
+
+# Create an agent that will serve as your chatbot
+chatbot = create_chatbot_agent()
@@ -1,66 +1,40 @@
+import time
 from crewai import Agent, Task, Crew
 from crewai import tools as crew_tools
-from crew.agents import chatbot
+from crew.agents import create_chatbot_agent
 from crew.tasks import chatbot_task
+from crew.router import is_location_search, answer_location_query
+from crew.memory import ConversationMemory
+from crew.response_cache import SemanticResponseCache, RESPONSE_CACHE_ENABLED
+from crew.json_parser import extract_json, is_suggestions_payload
+from crew.pool import CrewPool
+from metrics import timed, instrumented
 
 
-# Initialize conversation history
-conversation_history = []
+# Conversation context per chat session. services.py installs a loader
+# that rehydrates evicted sessions from the chat_history table.
+conversation_memory = ConversationMemory()
 
-# from crewai import Crew
-
-# Create the crew with your agents
-assistant_crew = Crew(
-    agents=[chatbot],
-    tasks=[],  # Initialize with empty tasks list
-    verbose=2
-)
-
-import json
-import re
-
-def parse_llm_response_to_json(response):
-    """
-    Extract and parse JSON from LLM responses regardless of formatting.
-    """
-    # First try: Look for content between json code blocks
-    try:
-        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', response)
-        if json_match:
-            return json.loads(json_match.group(1))
-    except:
-        pass
-    
-    # Second try: Look for anything that might be a JSON object
-    try:
-        json_match = re.search(r'(\{[\s\S]*\})', response)
-        if json_match:
-            return json.loads(json_match.group(1))
-    except:
-        pass
-    
-    # Third try: Just attempt to parse the entire response
-    try:
-        return json.loads(response)
-    except:
-        return "flase"
+# Parsed JSON answers of earlier (or paraphrased) questions
+response_cache = SemanticResponseCache()
 
+# from crewai import Crew
 
+def create_crew():
+    """Create a crew with its own agent; the task is set per query."""
+    return Crew(
+        agents=[create_chatbot_agent()],
+        tasks=[],  # Initialize with empty tasks list
+        verbose=2
+    )
 
+# One crew per concurrent query, since a running crew holds its task list
+crew_pool = CrewPool(create_crew)
 
-def process_user_query(user_input):
-    # Add user input to conversation history
-    conversation_history.append(f"User: {user_input}")
-    
-    # Create a task with conversation context
-    context = "\n".join(conversation_history[-5:])  # Include last 5 exchanges for context
-    query_task = Task(
-        # description=f"Process and respond to: '{user_input}'\nPrevious conversation context:\n{context}",
-        # expected_output="A helpful response that addresses the user's needs",
-        agent=chatbot,
-        
-        description=(
-            f"""Process and respond to: '{user_input}'\nPrevious conversation context:\n{context}
+# Prompt text of the per-query task, built once; only the query and its
+# context are filled in per call
+QUERY_TASK_DESCRIPTION = (
+    """Process and respond to: '{user_input}'\nPrevious conversation context:\n{context}
             You are an expert in travel planning and location suggestions. 
             Your responsibilities include:\n
             1. Answering queries related to location suggestions and trip planning\n
@@ -70,22 +44,73 @@ def process_user_query(user_input):
                 1. Analyze the user's description carefully and check for spell check\n
                 2. Use the location tool to find the 5 most relevant places\n
                 3. IMPORTANT: Your response must be a valid JSON object only, with no other text For location queries only."""
-        ),
-        expected_output=(
-            "For location queries: A raw **JSON** object containing 5 relevant locations.do not give type as text i only want json\n"
-            "For general queries: A friendly, informative response addressing the user's travel-related questions."
-        ),
-    )
+)
+QUERY_TASK_EXPECTED_OUTPUT = (
+    "For location queries: A raw **JSON** object containing 5 relevant locations.do not give type as text i only want json\n"
+    "For general queries: A friendly, informative response addressing the user's travel-related questions."
+)
+
+@instrumented("parse_llm_response_to_json")
+def parse_llm_response_to_json(response, validate=None):
+    """
+    Extract and parse JSON from LLM responses regardless of formatting.
+    Returns None when the response holds no JSON object; pass
+    validate=is_suggestions_payload to only accept location suggestions.
+    """
+    return extract_json(response, validate)
+
+
+def remember(session_id, line):
+    """Record a conversation line for a chat session (anonymous requests are not kept)."""
+    if session_id is not None:
+        conversation_memory.append(session_id, line)
+
+
+@instrumented("process_user_query")
+def process_user_query(user_input, session_id=None):
+    # Previous exchanges of this chat session only
+    history = conversation_memory.get_context(session_id, 4) if session_id is not None else []
+    # Add user input to conversation history
+    remember(session_id, f"User: {user_input}")
+
+    # Plain place searches are answered straight from the location index
+    if is_location_search(user_input):
+        json_data = answer_location_query(user_input)
+        if json_data is not None:
+            remember(session_id, f"Assistant: {json_data}")
+            return json_data
+
+    # Answers only depend on the question when there is no earlier context
+    use_cache = RESPONSE_CACHE_ENABLED and not history
+    if use_cache:
+        cached = response_cache.get(user_input)
+        if cached is not None:
+            remember(session_id, f"Assistant: {cached}")
+            return cached
     
-    # Set the task and run the crew
-    assistant_crew.tasks = [query_task]
-    result = assistant_crew.kickoff()
-    json_data = parse_llm_response_to_json(result)
-    if json_data == "flase":
+    # Create a task with conversation context
+    context = "\n".join(history + [f"User: {user_input}"])  # Include last 5 exchanges for context
+    description = QUERY_TASK_DESCRIPTION.format(user_input=user_input, context=context)
+
+    # Check out a crew of our own, set the task and run it
+    started = time.perf_counter()
+    with crew_pool.checkout() as crew, timed("llm"):
+        crew.tasks = [Task(
+            agent=crew.agents[0],
+            description=description,
+            expected_output=QUERY_TASK_EXPECTED_OUTPUT,
+        )]
+        result = crew.kickoff()
+    # Only a suggestions payload counts: the raw output can also carry tool
+    # call arguments such as {"description": "malls in pune"}
+    json_data = parse_llm_response_to_json(result, validate=is_suggestions_payload)
+    if json_data is None:
         # Add response to conversation history
-        conversation_history.append(f"Assistant: {result}")
+        remember(session_id, f"Assistant: {result}")
         return result
     else:
+        if use_cache:
+            response_cache.put(user_input, json_data, time.perf_counter() - started)
         # Add response to conversation history
-        conversation_history.append(f"Assistant: {json_data}")
+        remember(session_id, f"Assistant: {json_data}")
         return json_data
\ No newline at end of file
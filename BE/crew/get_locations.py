@@ -1,45 +1,55 @@
-import faiss
-import pandas as pd
-import numpy as np
-from sentence_transformers import SentenceTransformer
+import logging
+from search_engine import get_engine, DEFAULT_INDEX_PATH, DEFAULT_MAPPING_PATH, DEFAULT_MODEL_NAME
+from metrics import instrumented
 
-def load_resources(index_path, mapping_path):
+logger = logging.getLogger(__name__)
+
+@instrumented("search_locations")
+def search_locations(query, index_path, 
+                     mapping_path, 
+                     model_name, 
+                     top_k,
+                     mode=None):
     """
-    Load the FAISS index and mapping data
+    Search for locations similar to the query
     
     Parameters:
     -----------
+    query : str
+        User query text
     index_path : str
         Path to the FAISS index file
     mapping_path : str
         Path to the mapping CSV file
+    model_name : str
+        Name of the sentence transformer model to use
+    top_k : int
+        Number of results to return
+    mode : str, optional
+        'hybrid' (BM25 + vector fusion) or 'vector'; defaults to SEARCH_MODE
         
     Returns:
     --------
-    index : faiss.Index
-        Loaded FAISS index
-    mapping_df : pandas.DataFrame
-        DataFrame with mapping information
+    results : list
+        List of dictionaries with search results
     """
-    print(f"Loading FAISS index from {index_path}...")
-    index = faiss.read_index(index_path)
+    # Resources are loaded once per engine and reused across queries
+    engine = get_engine(index_path, mapping_path, model_name)
     
-    print(f"Loading mapping data from {mapping_path}...")
-    mapping_df = pd.read_csv(mapping_path)
-    
-    return index, mapping_df
+    logger.info("Processing query: '%s'", query)
+    return engine.search(query, top_k, mode)
 
-def search_locations(query, index_path, 
-                     mapping_path, 
-                     model_name, 
-                     top_k):
+def search_locations_batch(queries, index_path, 
+                           mapping_path, 
+                           model_name, 
+                           top_k):
     """
-    Search for locations similar to the query
+    Search for locations similar to each query in a single batch
     
     Parameters:
     -----------
-    query : str
-        User query text
+    queries : list of str
+        User query texts
     index_path : str
         Path to the FAISS index file
     mapping_path : str
@@ -47,65 +57,31 @@ def search_locations(query, index_path,
     model_name : str
         Name of the sentence transformer model to use
     top_k : int
-        Number of results to return
+        Number of results to return per query
         
     Returns:
     --------
-    results : list
-        List of dictionaries with search results
+    results : list of list
+        Ranked results for each query, in input order
     """
-    # Load resources
-    index, mapping_df = load_resources(index_path, mapping_path)
-    
-    # Load model
-    print(f"Loading model {model_name}...")
-    model = SentenceTransformer(model_name)
-    
-    # Process query
-    print(f"Processing query: '{query}'")
-    query_vector = model.encode([query])[0].astype(np.float32)
-    
-    # Check if we need to normalize the vector
-    # Assuming it was built with IP (inner product) similarity
-    if isinstance(index, faiss.IndexFlatIP):
-        query_vector = query_vector / np.linalg.norm(query_vector)
+    engine = get_engine(index_path, mapping_path, model_name)
     
-    # Search
-    distances, indices = index.search(query_vector.reshape(1, -1), top_k)
-    
-    # Extract results
-    results = []
-    for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-        if idx == -1:  # FAISS returns -1 if fewer than k results are found
-            continue
-        
-        result = {
-            'rank': i + 1,
-            'score': float(distance),
-            'index': int(idx)
-        }
-        
-        # Add title and other available information
-        if 'title' in mapping_df.columns:
-            result['title'] = mapping_df.iloc[idx]['title']
-        
-        if 'place_id' in mapping_df.columns:
-            result['place_id'] = mapping_df.iloc[idx]['place_id']
-            
-        results.append(result)
-    
-    return results
+    logger.info("Processing %d queries", len(queries))
+    return engine.search_batch(queries, top_k)
 
+@instrumented("get_location")
 def get_location(query):
-    """Interactive search function"""
-    # Configuration
-    import os
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    index_path = os.path.join(base_dir, "data_collection", "location_vectors.faiss")
-    mapping_path = os.path.join(base_dir, "data_collection", "vector_mapping.csv")
-    model_name = "all-MiniLM-L6-v2"
+    """Search the default location index warmed at API startup."""
     k = 5
 
-    results = search_locations(query, index_path, mapping_path, model_name, k)
+    results = search_locations(query, DEFAULT_INDEX_PATH, DEFAULT_MAPPING_PATH, DEFAULT_MODEL_NAME, k)
 
     return results
+
+def get_locations_batch(queries, k=5):
+    """Search the default location index for many queries at once."""
+    return get_engine().search_batch(queries, k)
+
+def get_locations_nearby(query, lat, lng, radius_km, k=5):
+    """Search the default location index within radius_km of (lat, lng)."""
+    return get_engine().search_nearby(query, lat, lng, radius_km, k)
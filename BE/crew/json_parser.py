@@ -0,0 +1,116 @@
+import re
+import json
+
+_decoder = json.JSONDecoder()
+# Characters that change the scanner state; everything else is skipped by the regex engine
+_STRUCTURAL = re.compile(r'[{}"]')
+# Rest of a JSON string after its opening quote, honouring backslash escapes
+_STRING_END = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+
+
+def is_suggestions_payload(data):
+    """
+    Check the shape the agents are asked to answer location queries in:
+    {"suggestions": [{"title", "place_id", "description"}, ...], "description": str}
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("suggestions"), list):
+        return False
+    return all(isinstance(item, dict) and "title" in item for item in data["suggestions"])
+
+
+def extract_json(text, validate=None):
+    """
+    Return the first JSON object embedded in ``text``, or None.
+
+    Responses that are just JSON (optionally in a markdown fence) are
+    decoded directly, which also covers bare arrays. Otherwise a
+    left-to-right scan tracks brace depth and skips over JSON strings, so
+    braces inside strings and surrounding prose are handled without
+    backtracking, and only the structural characters are visited in
+    Python. Each balanced candidate is decoded once; when it is not valid
+    JSON, or ``validate(obj)`` rejects it, the scan continues after it.
+    A candidate that never closes started at a stray brace in prose; the
+    objects that closed inside it are tried once the text is exhausted.
+    An unterminated string can hide the rest of the text, so the first
+    one restarts the scan just after the stray brace; quotes from that
+    position on cannot close a string and are treated as prose after
+    that. The text is scanned at most twice.
+    """
+    if not isinstance(text, str):
+        text = str(text)
+
+    stripped = _strip_fence(text)
+    if stripped[:1] in ("{", "["):
+        data = _decode(stripped)
+        if data is not None and (validate is None or validate(data)):
+            return data
+
+    opens = []   # positions of the braces still open in the current candidate
+    nested = []  # objects closed inside it (outermost only), in text order
+    # Position after which no string can close, once an unterminated one is seen
+    unclosed_quote = None
+    pos = 0
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        if match is None:
+            break
+        i = match.start()
+        pos = i + 1
+        char = text[i]
+        if char == '"':
+            # Strings only matter inside an object; skip to the closing quote.
+            # No quote after an unterminated one can close a string, so
+            # those are prose.
+            if opens and (unclosed_quote is None or i < unclosed_quote):
+                end = _STRING_END.match(text, pos)
+                if end is not None:
+                    pos = end.end()
+                elif unclosed_quote is None:
+                    # The candidate cannot close and its first brace was
+                    # prose; rescan once, just after that brace
+                    unclosed_quote = i
+                    pos = opens[0] + 1
+                    opens.clear()
+                    nested.clear()
+                else:
+                    unclosed_quote = i
+        elif char == "{":
+            opens.append(i)
+        elif opens:
+            start = opens.pop()
+            if opens:
+                while nested and nested[-1][0] > start:
+                    nested.pop()
+                nested.append((start, pos))
+                continue
+            nested.clear()
+            data = _decode(text[start:pos])
+            if data is not None and (validate is None or validate(data)):
+                return data
+
+    # A candidate left open at the end started at a stray brace in prose;
+    # the objects that closed inside it are what a rescan after it would find
+    for start, end in nested:
+        data = _decode(text[start:end])
+        if data is not None and (validate is None or validate(data)):
+            return data
+    return None
+
+
+def _decode(candidate):
+    try:
+        data, end = _decoder.raw_decode(candidate)
+    except ValueError:
+        return None
+    return data if not candidate[end:].strip() else None
+
+
+def _strip_fence(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = text[3:]
+        if text.startswith("json"):
+            text = text[4:]
+        if text.endswith("```"):
+            text = text[:-3]
+    return text.strip()
@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+
+# Conversation memory limits, per session and overall
+MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "10"))
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "1000"))
+MEMORY_TTL_SECONDS = float(os.getenv("MEMORY_TTL_SECONDS", "1800"))
+
+
+class ConversationMemory:
+    """
+    Conversation context keyed by chat session id.
+
+    Each session keeps a ring buffer of its last ``max_turns`` lines.
+    Sessions idle for longer than ``ttl_seconds`` are dropped, and the
+    least recently used session is evicted once ``max_sessions`` is
+    reached. On a miss the context is rebuilt through ``loader``
+    (``loader(session_id, limit)`` returns the most recent lines, oldest
+    first), so evicted sessions pick up where they left off.
+    """
+
+    def __init__(self, max_turns=MEMORY_MAX_TURNS, max_sessions=MEMORY_MAX_SESSIONS,
+                 ttl_seconds=MEMORY_TTL_SECONDS, loader=None):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.loader = loader
+        self._sessions = OrderedDict()  # session_id -> [deque of lines, last access]
+        self._lock = threading.Lock()
+
+    def get_context(self, session_id, limit=None):
+        """Return the last ``limit`` lines of a session's conversation."""
+        lines = list(self._entry(session_id)[0])
+        return lines[-limit:] if limit else lines
+
+    def append(self, session_id, line):
+        """Add a line such as "User: ..." to a session's conversation."""
+        entry = self._entry(session_id)
+        with self._lock:
+            entry[0].append(line)
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _entry(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry[1] = now
+                self._sessions.move_to_end(session_id)
+                return entry
+
+        # Rehydrate outside the lock so a slow database does not block
+        # other sessions
+        lines = self.loader(session_id, self.max_turns) if self.loader else []
+
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = [deque(lines, maxlen=self.max_turns), now]
+                self._sessions[session_id] = entry
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            entry[1] = now
+            self._sessions.move_to_end(session_id)
+            return entry
+
+    def _evict_expired(self, now):
+        # Sessions are kept in access order, so expired ones are at the front
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry[1] <= self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
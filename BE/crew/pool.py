@@ -0,0 +1,76 @@
+import os
+import math
+import time
+import queue
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrency import CHAT_QUEUE_TIMEOUT, ExecutorSaturated
+
+# Crews that can run at the same time; match CHAT_WORKERS so every chat
+# worker can check one out without waiting
+CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", os.getenv("CHAT_WORKERS", "4")))
+
+
+class CrewPool:
+    """
+    Pool of independently built crews, checked out one per request.
+
+    A Crew carries mutable state (its task list, agent memory), so a
+    single shared instance cannot run two queries at once. Crews are
+    built lazily by ``factory`` up to ``size`` and returned to the pool
+    after use; when all are busy, ``checkout`` waits up to ``timeout``
+    seconds for one to come back and then raises ExecutorSaturated (503
+    with a Retry-After estimate), like a chat job that waited too long
+    for a worker.
+    """
+
+    def __init__(self, factory, size=CREW_POOL_SIZE, timeout=CHAT_QUEUE_TIMEOUT, window=100):
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._held_s = deque(maxlen=window)
+
+    @contextmanager
+    def checkout(self):
+        crew = self._acquire()
+        started = time.perf_counter()
+        try:
+            yield crew
+        finally:
+            self._held_s.append(time.perf_counter() - started)
+            self._idle.put(crew)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            build = self._created < self.size
+            if build:
+                self._created += 1
+        if build:
+            try:
+                return self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise ExecutorSaturated("No crew became available", 503, self.retry_after()) from None
+
+    def retry_after(self):
+        """Seconds until a crew is likely back, from recent checkout times."""
+        held = list(self._held_s)
+        if not held:
+            return 1
+        return max(1, math.ceil(sum(held) / len(held)))
+
+    def stats(self):
+        return {"size": self.size, "created": self._created, "idle": self._idle.qsize()}
@@ -0,0 +1,111 @@
+import os
+import copy
+import time
+import threading
+import numpy as np
+from search_engine import get_engine
+
+# Set RESPONSE_CACHE_ENABLED=0 to always ask the LLM
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+
+def encode_queries(texts):
+    """Embed queries with the location search model (and its embedding cache)."""
+    return get_engine().encode_batch(texts)
+
+
+class SemanticResponseCache:
+    """
+    Cache of chatbot answers keyed by query embedding.
+
+    A query hits when the cosine similarity between its embedding and a
+    cached query's is at least ``threshold``, so paraphrases such as
+    "malls in pune" / "shopping malls in Pune" share an answer. Entries
+    expire after ``ttl_seconds`` and the least recently used entry is
+    replaced once ``max_size`` entries are stored. Embeddings live in one
+    matrix so a lookup is a single matrix-vector product.
+    """
+
+    def __init__(self, threshold=RESPONSE_CACHE_THRESHOLD, max_size=RESPONSE_CACHE_SIZE,
+                 ttl_seconds=RESPONSE_CACHE_TTL, encoder=encode_queries):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.encoder = encoder
+        self._vectors = None  # (max_size, dim) unit vectors, allocated on first store
+        self._entries = [None] * max_size  # (query, response, llm_seconds)
+        self._created = np.full(max_size, -np.inf)
+        self._last_used = np.full(max_size, -np.inf)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _embed(self, query):
+        vector = np.asarray(self.encoder([query]), dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, query):
+        """Return a deep copy of the cached answer for ``query``, or None."""
+        vector = self._embed(query)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is not None:
+                live = (now - self._created) <= self.ttl_seconds
+                similarities = np.where(live, self._vectors @ vector, -np.inf)
+                slot = int(np.argmax(similarities))
+                if similarities[slot] >= self.threshold:
+                    self._last_used[slot] = now
+                    _, response, llm_seconds = self._entries[slot]
+                    self.hits += 1
+                    self.saved_seconds += llm_seconds
+                    return copy.deepcopy(response)
+            self.misses += 1
+        return None
+
+    def put(self, query, response, llm_seconds=0.0):
+        """Store ``response``; ``llm_seconds`` is what a later hit saves."""
+        vector = self._embed(query)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, len(vector)), dtype=np.float32)
+            expired = (now - self._created) > self.ttl_seconds
+            # Reuse an expired (or empty) slot first, else the least recently used
+            slot = int(np.argmax(expired)) if expired.any() else int(np.argmin(self._last_used))
+            self._vectors[slot] = vector
+            self._entries[slot] = (query, copy.deepcopy(response), float(llm_seconds))
+            self._created[slot] = now
+            self._last_used[slot] = now
+
+    def clear(self):
+        with self._lock:
+            self._vectors = None
+            self._entries = [None] * self.max_size
+            self._created[:] = -np.inf
+            self._last_used[:] = -np.inf
+
+    def __len__(self):
+        now = time.monotonic()
+        with self._lock:
+            return int(((now - self._created) <= self.ttl_seconds).sum())
+
+    def stats(self):
+        entries = len(self)
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": RESPONSE_CACHE_ENABLED,
+                "entries": entries,
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
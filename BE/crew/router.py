@@ -0,0 +1,118 @@
+import os
+import re
+from crew.get_locations import get_location
+from search_engine import get_engine
+
+# Set LOCATION_FAST_PATH=0 to send every query through the crew
+FAST_PATH_ENABLED = os.getenv("LOCATION_FAST_PATH", "1") == "1"
+
+# Words that name the kinds of places in the catalogue
+PLACE_WORDS = {
+    "mall", "malls", "temple", "temples", "mandir", "mandirs", "shopping",
+    "place", "places", "spot", "spots", "shrine", "shrines", "ganpati", "iskcon",
+}
+
+# Requests that need the LLM: questions, planning, explanations,
+# comparisons, chit-chat, and qualifiers the index cannot judge (opening
+# hours, price, food, who the visit is for, distance)
+OPEN_ENDED_WORDS = {
+    "what", "where", "which", "who", "how", "why", "when", "is", "are", "was", "were",
+    "do", "does", "did", "can", "could", "would", "will", "should",
+    "plan", "planning", "itinerary", "trip", "explain", "compare", "difference",
+    "history", "weather", "budget", "cost", "day", "days", "hello", "hi", "thanks",
+    "thank", "tell",
+    "open", "opening", "closed", "timing", "timings", "hours", "best", "better",
+    "cheap", "cheapest", "expensive", "price", "prices", "crowded",
+    "eat", "food", "restaurant", "restaurants", "cafe", "breakfast", "lunch", "dinner",
+    "romantic", "date", "kids", "children", "family", "friends", "couple", "couples",
+    "weekend", "today", "tonight", "tomorrow", "monday", "tuesday", "wednesday",
+    "thursday", "friday", "saturday", "sunday",
+    "near", "nearby", "nearest", "closest", "far", "distance", "route", "directions",
+}
+
+# The catalogue only covers Pune; searches in any other city go to the crew
+CATALOGUE_CITIES = {"pune"}
+OTHER_CITIES = {
+    "mumbai", "bombay", "thane", "delhi", "bangalore", "bengaluru", "hyderabad",
+    "chennai", "kolkata", "ahmedabad", "jaipur", "goa", "nashik", "nagpur",
+    "aurangabad", "kolhapur", "satara", "lonavala", "lonavla", "mahabaleshwar",
+    "shirdi", "solapur", "surat", "indore", "lucknow", "varanasi", "mysore",
+}
+
+# Words that say nothing about which places are wanted
+FILLER_WORDS = {
+    "a", "an", "the", "in", "at", "of", "for", "to", "and", "or", "with", "around",
+    "some", "any", "all", "me", "us", "i", "please", "show", "find", "list", "suggest",
+    "recommend", "give", "good", "nice", "famous", "popular", "top", "visit", "go", "see",
+}
+
+MAX_FAST_PATH_WORDS = 12
+
+# Minimum cosine similarity of the best hit, used when no BM25 index is loaded
+MIN_SIMILARITY = float(os.getenv("LOCATION_FAST_PATH_MIN_SIMILARITY", "0.35"))
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def is_location_search(user_input):
+    """
+    Return True for short, plain place-search queries such as
+    "malls in pune" or "suggest some temples in kothrud" that the FAISS
+    search can answer directly without an LLM round trip. Questions, with
+    or without a question mark, and searches outside the catalogue's
+    city are left to the crew.
+    """
+    if not FAST_PATH_ENABLED:
+        return False
+    words = _WORD_RE.findall(user_input.lower())
+    if not words or len(words) > MAX_FAST_PATH_WORDS or "?" in user_input:
+        return False
+    if OPEN_ENDED_WORDS.intersection(words):
+        return False
+    if (OTHER_CITIES - CATALOGUE_CITIES).intersection(words):
+        return False
+    return bool(PLACE_WORDS.intersection(words))
+
+
+def has_relevant_hits(user_input, results):
+    """
+    Return True when the hits actually match the query. The index returns
+    k hits for any text, so every query besides a bare category search
+    ("temples") must match at least one hit on a word other than a place
+    kind or filler, by BM25 when a BM25 index is loaded and by the best
+    hit's vector similarity otherwise.
+    """
+    terms = [word for word in _WORD_RE.findall(user_input.lower())
+             if word not in PLACE_WORDS and word not in FILLER_WORDS]
+    if not terms:
+        return True
+    engine = get_engine()
+    lexical = engine.lexical
+    if lexical is not None:
+        matched_ids, _ = lexical.search(" ".join(terms), len(lexical))
+        return not set(matched_ids.tolist()).isdisjoint(result["index"] for result in results)
+    return engine.similarity(results[0]["score"]) >= MIN_SIMILARITY
+
+
+def answer_location_query(user_input, k=5):
+    """
+    Answer a place-search query from the location index, in the same
+    {"suggestions": [...], "description": ...} format the crew returns.
+    Returns None when nothing relevant matches so the caller can fall back.
+    """
+    results = get_location(user_input)[:k]
+    if not results or not has_relevant_hits(user_input, results):
+        return None
+
+    suggestions = [
+        {
+            "title": result.get("title", ""),
+            "place_id": result.get("place_id", ""),
+            "description": f"{result.get('title', 'This place')} matches your search for '{user_input.strip()}'.",
+        }
+        for result in results
+    ]
+    return {
+        "suggestions": suggestions,
+        "description": f"Here are {len(suggestions)} places that match '{user_input.strip()}'.",
+    }
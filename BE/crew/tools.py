@@ -3,6 +3,7 @@
 from dotenv import load_dotenv
 load_dotenv()
 import os
+import asyncio
 from langchain.tools import BaseTool
 from typing import Optional, Type, Dict, List
 from pydantic import BaseModel, Field
@@ -46,21 +47,38 @@ class LocationSuggestionTool(BaseTool):
         Raises:
             ValueError: If description is invalid or no locations found
         """
-        if not description or len(description.strip()) < 3:
-            raise ValueError("Description must be at least 3 characters long")
+        self._check_description(description)
             
         try:
-            suggested_locations = get_location(description)
-            if not suggested_locations:
-                return {"suggestions": [], "message": "No locations found matching your description"}
-            # Return raw JSON without any markdown formatting
-            return suggested_locations
+            return self._format(get_location(description))
+        except Exception as e:
+            raise RuntimeError(f"Error getting location suggestions: {str(e)}")
+
+    async def _arun(self, description: str) -> str:
+        """
+        Async version of _run. The search runs on the event loop's default
+        executor, so concurrent tool calls in an async agent run overlap
+        instead of blocking the loop one after another.
+        """
+        self._check_description(description)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return self._format(await loop.run_in_executor(None, get_location, description))
         except Exception as e:
             raise RuntimeError(f"Error getting location suggestions: {str(e)}")
 
-    def _arun(self, description: str) -> str:
-        """Async version is not implemented."""
-        raise NotImplementedError("Async version not implemented")
+    @staticmethod
+    def _check_description(description):
+        if not description or len(description.strip()) < 3:
+            raise ValueError("Description must be at least 3 characters long")
+
+    @staticmethod
+    def _format(suggested_locations):
+        if not suggested_locations:
+            return {"suggestions": [], "message": "No locations found matching your description"}
+        # Return raw JSON without any markdown formatting
+        return suggested_locations
 
 # Initialize tools
 search_tool = SerperDevTool()
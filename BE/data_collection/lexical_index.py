@@ -0,0 +1,147 @@
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+
+DEFAULT_TOKEN_PATTERN = r"[a-z0-9]+"
+
+
+def lexical_index_path(index_path):
+    """Path of the BM25 index saved next to a FAISS index."""
+    return os.path.splitext(index_path)[0] + "_bm25.npz"
+
+
+_stemmer = None
+
+
+@lru_cache(maxsize=65536)
+def stem_token(word):
+    """Porter-stem a token, matching the stemming of the review text."""
+    global _stemmer
+    if _stemmer is None:
+        from nltk.stem.porter import PorterStemmer
+        _stemmer = PorterStemmer()
+    return _stemmer.stem(word)
+
+
+class BM25Index:
+    """
+    Compact BM25 inverted index over place texts.
+
+    Postings are stored CSR style: the postings of term ``t`` are
+    ``postings[term_ptr[t]:term_ptr[t + 1]]`` (document rows) with matching
+    term frequencies in ``tfs``. Documents are identified externally by
+    the same stable ids as the FAISS index.
+    """
+
+    def __init__(self, vocab, term_ptr, postings, tfs, doc_ids, doc_lengths,
+                 k1=1.2, b=0.75, token_pattern=DEFAULT_TOKEN_PATTERN, stem=True):
+        self.vocab = np.asarray(vocab, dtype=str)
+        self.term_ptr = np.asarray(term_ptr, dtype=np.int64)
+        self.postings = np.asarray(postings, dtype=np.int32)
+        self.tfs = np.asarray(tfs, dtype=np.uint16)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.int32)
+        self.k1 = float(k1)
+        self.b = float(b)
+        self.token_pattern = token_pattern
+        self.stem = bool(stem)
+
+        self._token_re = re.compile(token_pattern)
+        self._term_of = {term: i for i, term in enumerate(self.vocab.tolist())}
+        n_docs = len(self.doc_ids)
+        doc_freq = np.diff(self.term_ptr)
+        self.idf = np.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        self.avgdl = float(self.doc_lengths.mean()) if n_docs else 0.0
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def tokenize(self, text):
+        tokens = self._token_re.findall(str(text).lower())
+        if self.stem:
+            tokens = [stem_token(token) for token in tokens]
+        return tokens
+
+    @classmethod
+    def build(cls, texts, doc_ids, k1=1.2, b=0.75, token_pattern=DEFAULT_TOKEN_PATTERN, stem=True):
+        """Build an index from raw texts aligned with ``doc_ids``."""
+        empty = cls([], [0], [], [], [], [], k1, b, token_pattern, stem)
+        return empty.updated([], texts, doc_ids)
+
+    def updated(self, remove_ids, texts, doc_ids):
+        """
+        Return a new index without ``remove_ids`` and with ``texts`` added
+        (replacing any existing document with the same id). Existing
+        documents are carried over from the postings, not re-tokenized.
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        drop = set(np.asarray(remove_ids, dtype=np.int64).tolist()) | set(doc_ids.tolist())
+        keep_rows = np.array([row for row, doc_id in enumerate(self.doc_ids.tolist()) if doc_id not in drop],
+                             dtype=np.int64)
+
+        # Existing postings as (term, row, tf) triplets, rows renumbered
+        new_row = np.full(len(self.doc_ids), -1, dtype=np.int64)
+        new_row[keep_rows] = np.arange(len(keep_rows))
+        posting_terms = np.repeat(np.arange(len(self.vocab)), np.diff(self.term_ptr))
+        kept = new_row[self.postings] >= 0 if len(self.postings) else np.zeros(0, dtype=bool)
+        terms = self.vocab[posting_terms[kept]].tolist()
+        rows = new_row[self.postings[kept]].tolist()
+        tfs = self.tfs[kept].tolist()
+        lengths = self.doc_lengths[keep_rows].tolist()
+
+        for offset, text in enumerate(texts):
+            counts = Counter(self.tokenize(text))
+            row = len(keep_rows) + offset
+            for term, tf in counts.items():
+                terms.append(term)
+                rows.append(row)
+                tfs.append(min(tf, np.iinfo(np.uint16).max))
+            lengths.append(sum(counts.values()))
+
+        vocab = sorted(set(terms))
+        term_index = {term: i for i, term in enumerate(vocab)}
+        term_ids = np.array([term_index[term] for term in terms], dtype=np.int64)
+        rows = np.array(rows, dtype=np.int64)
+        order = np.lexsort((rows, term_ids))
+        term_ptr = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(vocab)))])
+
+        return BM25Index(vocab, term_ptr, rows[order], np.array(tfs)[order] if tfs else [],
+                         np.concatenate([self.doc_ids[keep_rows], doc_ids]), lengths,
+                         self.k1, self.b, self.token_pattern, self.stem)
+
+    def search(self, query, top_n=10):
+        """Return (doc_ids, scores) of the best ``top_n`` matching documents."""
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for term in set(self.tokenize(query)):
+            t = self._term_of.get(term)
+            if t is None:
+                continue
+            start, end = self.term_ptr[t], self.term_ptr[t + 1]
+            rows = self.postings[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows] / self.avgdl)
+            scores[rows] += self.idf[t] * tf * (self.k1 + 1) / (tf + norm)
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > top_n:
+            matched = matched[np.argpartition(-scores[matched], top_n - 1)[:top_n]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+        return self.doc_ids[matched], scores[matched]
+
+    def save(self, path):
+        with open(f"{path}.tmp", 'wb') as f:
+            np.savez(f, vocab=self.vocab, term_ptr=self.term_ptr, postings=self.postings,
+                     tfs=self.tfs, doc_ids=self.doc_ids, doc_lengths=self.doc_lengths,
+                     params=np.array([self.k1, self.b]), token_pattern=np.array(self.token_pattern),
+                     stem=np.array(self.stem))
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            k1, b = data['params'].tolist()
+            return cls(data['vocab'], data['term_ptr'], data['postings'], data['tfs'],
+                       data['doc_ids'], data['doc_lengths'], k1, b,
+                       str(data['token_pattern']), bool(data['stem']))
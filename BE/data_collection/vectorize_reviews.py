@@ -1,7 +1,12 @@
+import os
+import json
+import time
+import hashlib
 import pandas as pd
 import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
+from lexical_index import BM25Index, lexical_index_path
 
 def load_data(file_path):
     """Load data from CSV file and handle missing values."""
@@ -19,31 +24,281 @@ def convert_to_vectors(texts, model_name='all-MiniLM-L6-v2'):
     vectors = model.encode(texts, show_progress_bar=True)
     return vectors.astype(np.float32)  # Convert to float32 for FAISS
 
-def create_faiss_index(vectors, index_type='flat'):
-    """Create and populate a FAISS index."""
+def place_vector_ids(place_ids):
+    """Derive stable int64 FAISS ids from Google place_ids."""
+    return np.array([
+        int.from_bytes(hashlib.blake2b(str(place_id).encode('utf-8'), digest_size=8).digest(), 'little')
+        & 0x7FFFFFFFFFFFFFFF
+        for place_id in place_ids
+    ], dtype=np.int64)
+
+# Index types that can be built, see create_faiss_index
+INDEX_TYPES = ['flat', 'ip', 'ivf', 'hnsw', 'ivfpq', 'sq8', 'fp16']
+
+# Scalar quantizers for the compressed exact-scan index types
+SCALAR_QUANTIZERS = {
+    'sq8': faiss.ScalarQuantizer.QT_8bit,   # 1 byte per dimension
+    'fp16': faiss.ScalarQuantizer.QT_fp16,  # 2 bytes per dimension
+}
+
+def create_faiss_index(vectors, index_type='flat', metric='l2', nlist=100, M=32,
+                       ef_construction=40, ef_search=64, nprobe=8, pq_m=16, pq_nbits=8,
+                       ids=None):
+    """
+    Create and populate a FAISS index.
+
+    Parameters:
+    -----------
+    vectors : numpy.ndarray
+        float32 matrix of shape (n, d)
+    index_type : str
+        'flat' (exact, in ``metric``), 'ip' (exact inner product), one of the
+        approximate types 'ivf' (IVF-Flat), 'hnsw' or 'ivfpq' (IVF-PQ), or
+        the scalar quantized exact-scan types 'sq8' (int8) and 'fp16'
+    metric : str
+        'l2' or 'ip' for the flat, approximate and quantized index types
+    nlist : int
+        Number of inverted lists (IVF types)
+    M : int
+        Graph neighbours per node (HNSW)
+    ef_construction, ef_search : int
+        HNSW build and query breadth
+    nprobe : int
+        Inverted lists visited per query (IVF types)
+    pq_m, pq_nbits : int
+        Sub-quantizers and bits per code (IVF-PQ)
+    ids : array-like of int64, optional
+        Stable vector ids (see place_vector_ids). The index is then wrapped
+        in an IndexIDMap2 so places can be upserted or removed later.
+        Removal is not supported by 'hnsw' indexes.
+    """
     dimension = vectors.shape[1]
+    n = len(vectors)
     print(f"Creating FAISS index with dimension {dimension}...")
-    
+
+    if index_type == 'ip':
+        metric = 'ip'
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == 'ip' else faiss.METRIC_L2
+    if faiss_metric == faiss.METRIC_INNER_PRODUCT:
+        # Cosine similarity: queries are normalized the same way at search time
+        vectors = vectors.copy()
+        faiss.normalize_L2(vectors)
+
+    # Small datasets cannot train as many centroids as large ones
+    if index_type in ('ivf', 'ivfpq') and nlist > n:
+        print(f"Reducing nlist from {nlist} to {n} for {n} vectors")
+        nlist = n
+    if index_type == 'ivfpq' and 2 ** pq_nbits > n:
+        reduced = max(1, int(np.log2(n)))
+        print(f"Reducing pq_nbits from {pq_nbits} to {reduced} for {n} vectors")
+        pq_nbits = reduced
+
     if index_type == 'flat':
-        # Basic flat index using L2 distance
-        index = faiss.IndexFlatL2(dimension)
+        # Basic exact index in the requested metric
+        index = faiss.IndexFlat(dimension, faiss_metric)
     elif index_type == 'ip':
         # Inner product index (for cosine similarity with normalized vectors)
         index = faiss.IndexFlatIP(dimension)
+    elif index_type == 'ivf':
+        quantizer = faiss.IndexFlat(dimension, faiss_metric)
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss_metric)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, M, faiss_metric)
+        index.hnsw.efConstruction = ef_construction
+    elif index_type == 'ivfpq':
+        quantizer = faiss.IndexFlat(dimension, faiss_metric)
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_nbits, faiss_metric)
+    elif index_type in SCALAR_QUANTIZERS:
+        index = faiss.IndexScalarQuantizer(dimension, SCALAR_QUANTIZERS[index_type], faiss_metric)
     else:
         raise ValueError(f"Unsupported index type: {index_type}")
-    
+
+    if not index.is_trained:
+        print(f"Training {index_type} index on {n} vectors...")
+        index.train(vectors)
+
+    # Query-time parameters are stored with the index
+    if index_type == 'hnsw':
+        index.hnsw.efSearch = ef_search
+    elif index_type in ('ivf', 'ivfpq'):
+        index.nprobe = min(nprobe, nlist)
+
     print(f"Adding {len(vectors)} vectors to index...")
-    index.add(vectors)
+    if ids is not None:
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    else:
+        index.add(vectors)
     return index
 
+def index_memory_bytes(index):
+    """Size of the serialized index, a close proxy for its resident memory."""
+    return int(faiss.serialize_index(index).nbytes)
+
+def evaluate_index(index, vectors, k=5, baseline=None, n_queries=None):
+    """
+    Compare an index against an exact flat float32 baseline.
+
+    The dataset vectors themselves are used as queries. Returns recall@k
+    (overlap of the top-k ids with the exact top-k), how often the top
+    result agrees, the serialized index size and per-query latency.
+    """
+    queries = vectors if n_queries is None else vectors[:n_queries]
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        queries = queries.copy()
+        faiss.normalize_L2(queries)
+
+    if baseline is None:
+        baseline = faiss.IndexFlat(index.d, index.metric_type)
+        baseline_vectors = np.ascontiguousarray(vectors, dtype=np.float32).copy()
+        if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            faiss.normalize_L2(baseline_vectors)
+        baseline.add(baseline_vectors)
+    k = min(k, index.ntotal)
+    _, expected = baseline.search(queries, k)
+
+    latencies = []
+    found = np.empty_like(expected)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found[i] = ids[0]
+
+    hits = sum(len(set(expected[i]) & set(found[i])) for i in range(len(queries)))
+    latencies = np.array(latencies)
+    memory_bytes = index_memory_bytes(index)
+    return {
+        'recall_at_k': hits / float(len(queries) * k),
+        'top1_agreement': float(np.mean(expected[:, 0] == found[:, 0])),
+        'k': k,
+        'queries': len(queries),
+        'memory_bytes': memory_bytes,
+        'bytes_per_vector': memory_bytes / max(index.ntotal, 1),
+        'latency_ms_mean': float(latencies.mean()),
+        'latency_ms_p50': float(np.percentile(latencies, 50)),
+        'latency_ms_p99': float(np.percentile(latencies, 99)),
+    }
+
+def build_index_report(vectors, index_types=None, k=5, metric='l2', **index_params):
+    """
+    Build each index type and report recall@k and top-1 agreement against
+    the float32 flat index, memory footprint and query latency.
+    """
+    report = {}
+    for index_type in index_types or INDEX_TYPES:
+        if index_type == 'ip' and metric != 'ip':
+            continue
+        start = time.perf_counter()
+        index = create_faiss_index(vectors, index_type, metric=metric, **index_params)
+        build_seconds = time.perf_counter() - start
+        report[index_type] = dict(evaluate_index(index, vectors, k), build_seconds=build_seconds)
+
+    print(f"\n{'index':<8}{'recall@' + str(k):>10}{'top1':>8}{'KiB':>10}{'p50 ms':>10}{'p99 ms':>10}{'build s':>10}")
+    for index_type, row in report.items():
+        print(f"{index_type:<8}{row['recall_at_k']:>10.3f}{row['top1_agreement']:>8.3f}"
+              f"{row['memory_bytes'] / 1024:>10.1f}{row['latency_ms_p50']:>10.3f}"
+              f"{row['latency_ms_p99']:>10.3f}{row['build_seconds']:>10.3f}")
+    return report
+
 def save_index_and_mapping(index, df, index_path, mapping_path):
     """Save FAISS index and id mapping."""
+    # Write to temporary files first so readers never see a partial file
     print(f"Saving FAISS index to {index_path}...")
-    faiss.write_index(index, index_path)
+    faiss.write_index(index, f"{index_path}.tmp")
     
     print(f"Saving mapping data to {mapping_path}...")
-    df[['position', 'title', 'place_id']].to_csv(mapping_path, index=False)
+    columns = [col for col in ['vector_id', 'position', 'title', 'place_id', 'latitude', 'longitude']
+               if col in df.columns]
+    df[columns].to_csv(f"{mapping_path}.tmp", index=False)
+
+    # Binary columnar copy, sorted by vector id, for fast loading and lookup
+    npz_path = os.path.splitext(mapping_path)[0] + ".npz"
+    print(f"Saving columnar mapping to {npz_path}...")
+    mapping = df[columns].sort_values('vector_id') if 'vector_id' in columns else df[columns]
+    arrays = {}
+    for col in columns:
+        values = mapping[col]
+        if values.dtype.kind in 'biuf':
+            arrays[col] = values.to_numpy()
+        else:
+            arrays[col] = np.array(values.fillna('').astype(str).tolist(), dtype=str)
+    if 'vector_id' not in arrays:
+        arrays['vector_id'] = np.arange(len(mapping), dtype=np.int64)
+    with open(f"{npz_path}.tmp", 'wb') as f:
+        np.savez(f, **arrays)
+
+    os.replace(f"{npz_path}.tmp", npz_path)
+    os.replace(f"{mapping_path}.tmp", mapping_path)
+    os.replace(f"{index_path}.tmp", index_path)
+
+def load_index_with_ids(index_path, mapping_path):
+    """
+    Load an index and mapping keyed by place_id derived vector ids.
+
+    Indexes saved before stable ids were introduced are flat indexes whose
+    row position is the id; they are converted to an IndexIDMap2.
+    """
+    index = faiss.read_index(index_path)
+    mapping_df = pd.read_csv(mapping_path)
+    if 'vector_id' in mapping_df.columns:
+        return index, mapping_df
+
+    if not isinstance(index, faiss.IndexFlat):
+        raise ValueError("Index has no stable ids; rebuild it with main() first")
+    print("Converting positional index to stable place ids...")
+    vectors = index.reconstruct_n(0, index.ntotal)
+    mapping_df.insert(0, 'vector_id', place_vector_ids(mapping_df['place_id']))
+    id_index = faiss.IndexIDMap2(faiss.IndexFlat(index.d, index.metric_type))
+    id_index.add_with_ids(vectors, mapping_df['vector_id'].values)
+    return id_index, mapping_df
+
+def update_lexical_index(index_path, remove_ids, texts, ids):
+    """Apply an upsert or removal to the BM25 index saved next to the FAISS index."""
+    path = lexical_index_path(index_path)
+    if not os.path.exists(path):
+        return
+    BM25Index.load(path).updated(remove_ids, texts, ids).save(path)
+
+def upsert_places(places_df, index_path="location_vectors.faiss",
+                  mapping_path="vector_mapping.csv", model_name="all-MiniLM-L6-v2"):
+    """
+    Insert new places or replace existing ones (matched by place_id) in the
+    saved index without re-encoding the rest of the catalogue. The running
+    search engine picks up the new files on its next reload check.
+    """
+    index, mapping_df = load_index_with_ids(index_path, mapping_path)
+
+    places_df = places_df.drop_duplicates('place_id', keep='last').copy()
+    places_df['combined_text'] = places_df['combined_text'].fillna('')
+    places_df['vector_id'] = place_vector_ids(places_df['place_id'])
+    ids = places_df['vector_id'].values
+
+    removed = index.remove_ids(ids)
+    vectors = convert_to_vectors(places_df['combined_text'].tolist(), model_name)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        faiss.normalize_L2(vectors)
+    index.add_with_ids(vectors, ids)
+    update_lexical_index(index_path, ids, places_df['combined_text'].tolist(), ids)
+
+    columns = list(mapping_df.columns) + [col for col in ('latitude', 'longitude')
+                                          if col in places_df.columns and col not in mapping_df.columns]
+    mapping_df = mapping_df[~mapping_df['vector_id'].isin(ids)].reindex(columns=columns)
+    mapping_df = pd.concat([mapping_df, places_df.reindex(columns=columns)], ignore_index=True)
+    save_index_and_mapping(index, mapping_df, index_path, mapping_path)
+    print(f"Upserted {len(ids)} places ({removed} replaced)")
+
+def remove_places(place_ids, index_path="location_vectors.faiss", mapping_path="vector_mapping.csv"):
+    """Remove places by place_id from the saved index and mapping."""
+    index, mapping_df = load_index_with_ids(index_path, mapping_path)
+    ids = place_vector_ids(place_ids)
+
+    removed = index.remove_ids(ids)
+    update_lexical_index(index_path, ids, [], [])
+    mapping_df = mapping_df[~mapping_df['vector_id'].isin(ids)]
+    save_index_and_mapping(index, mapping_df, index_path, mapping_path)
+    print(f"Removed {removed} places")
 
 def main():
     # Configuration
@@ -51,13 +306,34 @@ def main():
     index_path = "location_vectors.faiss"
     mapping_path = "vector_mapping.csv"
     model_name = "all-MiniLM-L6-v2"
-    index_type = "flat"  # 'flat' for L2 distance, 'ip' for inner product
+    index_type = "flat"  # 'flat', 'ip', approximate 'ivf', 'hnsw', 'ivfpq', or quantized 'sq8', 'fp16'
+    index_params = {
+        'metric': 'l2',
+        'nlist': 100,       # IVF lists; reduced automatically for small datasets
+        'nprobe': 8,        # IVF lists scanned per query
+        'M': 32,            # HNSW neighbours per node
+        'ef_search': 64,    # HNSW search breadth
+        'pq_m': 16,         # IVF-PQ sub-quantizers (must divide the dimension)
+    }
+    report_path = "index_report.json"  # Set to None to skip the comparison
     
     # Process data
     df = load_data(file_path)
+    df['vector_id'] = place_vector_ids(df['place_id'])
     vectors = convert_to_vectors(df['combined_text'].tolist(), model_name)
-    index = create_faiss_index(vectors, index_type)
+    index = create_faiss_index(vectors, index_type, ids=df['vector_id'].values, **index_params)
+
+    # BM25 index over the same texts for hybrid lexical + vector retrieval
+    bm25_path = lexical_index_path(index_path)
+    print(f"Saving BM25 index to {bm25_path}...")
+    BM25Index.build(df['combined_text'].tolist(), df['vector_id'].values).save(bm25_path)
     save_index_and_mapping(index, df, index_path, mapping_path)
+
+    if report_path:
+        report = build_index_report(vectors, k=5, **index_params)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Index comparison saved to {report_path}")
     
     print(f"Done! Successfully processed {len(df)} locations.")
 
@@ -0,0 +1,110 @@
+import os
+import re
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text):
+    """Normalize query text so trivially different spellings share a key."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class EmbeddingCache:
+    """
+    Size-bounded LRU cache of query embeddings keyed by normalized text.
+
+    When ``persist_path`` is given the cache is loaded from that file on
+    start-up and written back on ``save()`` and at interpreter exit.
+    """
+
+    def __init__(self, max_size=1024, persist_path=None, model_name=None):
+        self.max_size = max_size
+        self.persist_path = persist_path
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if persist_path:
+            self.load()
+            atexit.register(self.save)
+
+    def get(self, text):
+        """Return the cached vector for ``text`` or None, updating counters."""
+        key = normalize_query(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, text, vector):
+        """Store ``vector`` for ``text``, evicting the least recently used entry."""
+        key = normalize_query(text)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def save(self):
+        """Write the cache to ``persist_path`` (oldest entries first)."""
+        if not self.persist_path:
+            return
+        with self._lock:
+            keys = list(self._entries.keys())
+            vectors = list(self._entries.values())
+        if not keys:
+            return
+        tmp_path = f"{self.persist_path}.tmp.npz"
+        np.savez(tmp_path,
+                 keys=np.array(keys, dtype=str),
+                 vectors=np.stack(vectors).astype(np.float32),
+                 model_name=np.array(self.model_name or ""))
+        os.replace(tmp_path, self.persist_path)
+
+    def load(self):
+        """Load entries from ``persist_path`` if it exists and matches the model."""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with np.load(self.persist_path, allow_pickle=False) as data:
+                if str(data["model_name"]) != (self.model_name or ""):
+                    logger.info("Ignoring embedding cache built for another model: %s", self.persist_path)
+                    return
+                keys, vectors = data["keys"], data["vectors"]
+        except Exception as e:
+            logger.warning("Could not load embedding cache %s: %s", self.persist_path, e)
+            return
+
+        with self._lock:
+            for key, vector in zip(keys[-self.max_size:], vectors[-self.max_size:]):
+                self._entries[str(key)] = vector
+        logger.info("Loaded %d cached embeddings from %s", len(self._entries), self.persist_path)
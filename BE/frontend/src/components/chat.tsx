@@ -77,6 +77,7 @@ export function Chat() {
       // Use streamChat to get AI response and append to chat
       await streamChat({
         inputContent,
+        sessionId: parseInt(sessionId),
         setIsLoading,
         append: async (aiMessage) => {
           let aiContent = aiMessage.content;
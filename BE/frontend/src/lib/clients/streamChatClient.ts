@@ -6,23 +6,33 @@ const apiUrl = process.env.NEXT_PUBLIC_API_URL ?? "http://localhost:8000";
 
 export const streamChat = async ({
   inputContent,
+  sessionId,
   setIsLoading,
   append,
 }: {
   inputContent: string;
+  sessionId?: number;
   setIsLoading: (isLoading: boolean) => void;
   append: (message: Message) => void;
 }) => {
   try {
     setIsLoading(true);
-    
+
+    // The backend only keeps conversation context for a session owned by
+    // the signed-in user, so send both the session id and the token
+    const headers: Record<string, string> = {
+      "Content-Type": "application/json",
+    };
+    const token = typeof window !== "undefined" ? localStorage.getItem("token") : null;
+    if (token) {
+      headers.Authorization = `Bearer ${token}`;
+    }
+
     // Call the cities API using fetch
     const response = await fetch(`${apiUrl}/locations`, {
       method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({ input_string: inputContent }),
+      headers,
+      body: JSON.stringify({ input_string: inputContent, session_id: sessionId }),
     });
 
     if (!response.ok) {
@@ -0,0 +1,69 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km; accepts scalars or numpy arrays."""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoGrid:
+    """
+    Uniform latitude/longitude grid over place coordinates.
+
+    Radius queries only visit the cells overlapping the search circle's
+    bounding box and then apply an exact haversine check, so the cost
+    depends on the number of nearby places rather than the catalogue size.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_deg=0.05):
+        self.cell_deg = cell_deg
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+
+        rows = np.flatnonzero(~(np.isnan(self.latitudes) | np.isnan(self.longitudes)))
+        cell_lat = np.floor(self.latitudes[rows] / cell_deg).astype(np.int64)
+        cell_lng = np.floor(self.longitudes[rows] / cell_deg).astype(np.int64)
+
+        self._cells = {}
+        for row, cell in zip(rows, zip(cell_lat.tolist(), cell_lng.tolist())):
+            self._cells.setdefault(cell, []).append(row)
+        self._cells = {cell: np.array(members, dtype=np.int64) for cell, members in self._cells.items()}
+
+    def __len__(self):
+        return sum(len(members) for members in self._cells.values())
+
+    def query_radius(self, lat, lng, radius_km):
+        """
+        Return (rows, distances_km) of places within ``radius_km`` of
+        (lat, lng), sorted by distance.
+        """
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        dlng = dlat / max(np.cos(np.radians(lat)), 1e-6)
+        lat_range = (int(np.floor((lat - dlat) / self.cell_deg)), int(np.floor((lat + dlat) / self.cell_deg)))
+        lng_range = (int(np.floor((lng - dlng) / self.cell_deg)), int(np.floor((lng + dlng) / self.cell_deg)))
+
+        n_cells = (lat_range[1] - lat_range[0] + 1) * (lng_range[1] - lng_range[0] + 1)
+        if n_cells > len(self._cells):
+            # Large radius: scanning the occupied cells is cheaper
+            members = [rows for (ci, cj), rows in self._cells.items()
+                       if lat_range[0] <= ci <= lat_range[1] and lng_range[0] <= cj <= lng_range[1]]
+        else:
+            members = [self._cells[(ci, cj)]
+                       for ci in range(lat_range[0], lat_range[1] + 1)
+                       for cj in range(lng_range[0], lng_range[1] + 1)
+                       if (ci, cj) in self._cells]
+        if not members:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        candidates = np.concatenate(members)
+        distances = haversine_km(lat, lng, self.latitudes[candidates], self.longitudes[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return candidates[order], distances[order]
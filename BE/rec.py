@@ -1,45 +1,51 @@
-import faiss
-import pandas as pd
-import numpy as np
-from sentence_transformers import SentenceTransformer
+import logging
+from search_engine import get_engine
 
-def load_resources(index_path, mapping_path):
+def search_locations(query, index_path="location_vectors.faiss", 
+                     mapping_path="vector_mapping.csv", 
+                     model_name="all-MiniLM-L6-v2", 
+                     top_k=5,
+                     mode=None):
     """
-    Load the FAISS index and mapping data
+    Search for locations similar to the query
     
     Parameters:
     -----------
+    query : str
+        User query text
     index_path : str
         Path to the FAISS index file
     mapping_path : str
         Path to the mapping CSV file
+    model_name : str
+        Name of the sentence transformer model to use
+    top_k : int
+        Number of results to return
+    mode : str, optional
+        'hybrid' (BM25 + vector fusion) or 'vector'; defaults to SEARCH_MODE
         
     Returns:
     --------
-    index : faiss.Index
-        Loaded FAISS index
-    mapping_df : pandas.DataFrame
-        DataFrame with mapping information
+    results : list
+        List of dictionaries with search results
     """
-    print(f"Loading FAISS index from {index_path}...")
-    index = faiss.read_index(index_path)
-    
-    print(f"Loading mapping data from {mapping_path}...")
-    mapping_df = pd.read_csv(mapping_path)
+    # Resources are loaded once per engine and reused across queries
+    engine = get_engine(index_path, mapping_path, model_name)
     
-    return index, mapping_df
+    print(f"Processing query: '{query}'")
+    return engine.search(query, top_k, mode)
 
-def search_locations(query, index_path="location_vectors.faiss", 
-                     mapping_path="vector_mapping.csv", 
-                     model_name="all-MiniLM-L6-v2", 
-                     top_k=5):
+def search_locations_batch(queries, index_path="location_vectors.faiss", 
+                           mapping_path="vector_mapping.csv", 
+                           model_name="all-MiniLM-L6-v2", 
+                           top_k=5):
     """
-    Search for locations similar to the query
+    Search for locations similar to each query in a single batch
     
     Parameters:
     -----------
-    query : str
-        User query text
+    queries : list of str
+        User query texts
     index_path : str
         Path to the FAISS index file
     mapping_path : str
@@ -47,62 +53,22 @@ def search_locations(query, index_path="location_vectors.faiss",
     model_name : str
         Name of the sentence transformer model to use
     top_k : int
-        Number of results to return
+        Number of results to return per query
         
     Returns:
     --------
-    results : list
-        List of dictionaries with search results
+    results : list of list
+        Ranked results for each query, in input order
     """
-    # Load resources
-    index, mapping_df = load_resources(index_path, mapping_path)
-    
-    # Load model
-    print(f"Loading model {model_name}...")
-    model = SentenceTransformer(model_name)
-    
-    # Process query
-    print(f"Processing query: '{query}'")
-    query_vector = model.encode([query])[0].astype(np.float32)
-    
-    # Check if we need to normalize the vector
-    # Assuming it was built with IP (inner product) similarity
-    if isinstance(index, faiss.IndexFlatIP):
-        query_vector = query_vector / np.linalg.norm(query_vector)
-    
-    # Search
-    distances, indices = index.search(query_vector.reshape(1, -1), top_k)
-    
-    # Extract results
-    results = []
-    for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-        if idx == -1:  # FAISS returns -1 if fewer than k results are found
-            continue
-        
-        result = {
-            'rank': i + 1,
-            'score': float(distance),
-            'index': int(idx)
-        }
-        
-        # Add title and other available information
-        if 'title' in mapping_df.columns:
-            result['title'] = mapping_df.iloc[idx]['title']
-        
-        if 'place_id' in mapping_df.columns:
-            result['place_id'] = mapping_df.iloc[idx]['place_id']
-            
-        # Add geospatial information if available
-        # for geo_col in ['latitude', 'longitude', 'lat', 'lng']:
-        #     if geo_col in mapping_df.columns:
-        #         result[geo_col] = mapping_df.iloc[idx][geo_col]
-        
-        results.append(result)
+    engine = get_engine(index_path, mapping_path, model_name)
     
-    return results
+    print(f"Processing {len(queries)} queries")
+    return engine.search_batch(queries, top_k)
 
 def main():
     """Interactive search function"""
+    # Show the engine's loading messages
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     # Configuration
     index_path = "location_vectors.faiss"
     mapping_path = "vector_mapping.csv"
@@ -0,0 +1,473 @@
+import os
+import time
+import logging
+import threading
+import faiss
+import pandas as pd
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from embedding_cache import EmbeddingCache, normalize_query
+from geo_index import GeoGrid
+from data_collection.lexical_index import BM25Index, lexical_index_path
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Default resources shipped with the backend
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_PATH = os.path.join(BASE_DIR, "data_collection", "location_vectors.faiss")
+DEFAULT_MAPPING_PATH = os.path.join(BASE_DIR, "data_collection", "vector_mapping.csv")
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Query embedding cache, optionally persisted across restarts
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+
+# How often (seconds) to check whether the index files changed on disk
+INDEX_RELOAD_INTERVAL = float(os.getenv("INDEX_RELOAD_INTERVAL", "5"))
+
+# Memory-map the index file instead of copying its vectors into each
+# process. IO_FLAG_MMAP_IFC covers flat codes (Flat, IDMap2, SQ, HNSW
+# storage) as well as IVF lists; older faiss builds only have IO_FLAG_MMAP,
+# which maps IVF inverted lists and still copies everything else.
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") == "1"
+
+# 'hybrid' fuses BM25 and vector rankings when a BM25 index exists,
+# 'vector' uses dense retrieval only
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")
+# Reciprocal rank fusion constant and how many candidates each ranker contributes
+RRF_K = 60
+HYBRID_CANDIDATES = 50
+
+
+def columnar_mapping_path(mapping_path):
+    """Path of the binary columnar mapping written next to the CSV mapping."""
+    return os.path.splitext(mapping_path)[0] + ".npz"
+
+
+class PlaceMapping:
+    """
+    Columnar place mapping sorted by vector id.
+
+    Lookups take an array of FAISS ids and return row numbers with a single
+    searchsorted call, so result assembly never materializes pandas rows.
+    """
+
+    def __init__(self, columns):
+        order = np.argsort(columns['vector_id'], kind='stable')
+        self.columns = {name: np.asarray(values)[order] for name, values in columns.items()}
+        self.ids = self.columns['vector_id']
+
+        self.geo = None
+        if 'latitude' in self.columns and 'longitude' in self.columns:
+            self.geo = GeoGrid(self.columns['latitude'], self.columns['longitude'])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    @classmethod
+    def from_csv(cls, path):
+        df = pd.read_csv(path)
+        columns = {}
+        for name in df.columns:
+            values = df[name]
+            if values.dtype.kind in 'biuf':
+                columns[name] = values.to_numpy()
+            else:
+                columns[name] = np.array(values.fillna('').astype(str).tolist(), dtype=str)
+        # Mappings saved before stable ids use the row position as the id
+        if 'vector_id' not in columns:
+            columns['vector_id'] = np.arange(len(df), dtype=np.int64)
+        return cls(columns)
+
+    @classmethod
+    def from_npz(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def lookup(self, ids):
+        """Return the row of each id, or -1 where the id is unknown."""
+        ids = np.asarray(ids, dtype=np.int64)
+        rows = np.searchsorted(self.ids, ids)
+        rows = np.minimum(rows, len(self.ids) - 1)
+        found = (len(self.ids) > 0) & (self.ids[rows] == ids)
+        return np.where(found, rows, -1)
+
+
+def load_resources(index_path, mapping_path):
+    """
+    Load the FAISS index and mapping data
+
+    Parameters:
+    -----------
+    index_path : str
+        Path to the FAISS index file
+    mapping_path : str
+        Path to the mapping CSV file. The binary columnar copy next to it
+        (same name, .npz) is used when present.
+
+    Returns:
+    --------
+    index : faiss.Index
+        Loaded FAISS index
+    mapping : PlaceMapping
+        Columnar mapping information
+    """
+    logger.info("Loading FAISS index from %s...", index_path)
+    index = None
+    if FAISS_MMAP:
+        try:
+            mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+            index = faiss.read_index(index_path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            logger.warning("Memory-mapped load failed, reading index into memory: %s", e)
+    if index is None:
+        index = faiss.read_index(index_path)
+
+    npz_path = columnar_mapping_path(mapping_path)
+    if os.path.exists(npz_path):
+        logger.info("Loading mapping data from %s...", npz_path)
+        mapping = PlaceMapping.from_npz(npz_path)
+    else:
+        logger.info("Loading mapping data from %s...", mapping_path)
+        mapping = PlaceMapping.from_csv(mapping_path)
+
+    return index, mapping
+
+
+def load_lexical_index(index_path):
+    """Load the BM25 index saved next to the FAISS index, or None if missing."""
+    path = lexical_index_path(index_path)
+    if not os.path.exists(path):
+        return None
+    logger.info("Loading BM25 index from %s...", path)
+    return BM25Index.load(path)
+
+
+class LocationSearchEngine:
+    """
+    Keeps the FAISS index, the place mapping and the sentence transformer
+    resident in memory so every query only pays for encoding and searching.
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH,
+                 mapping_path=DEFAULT_MAPPING_PATH,
+                 model_name=DEFAULT_MODEL_NAME,
+                 cache_size=EMBEDDING_CACHE_SIZE,
+                 cache_path=None):
+        self.index_path = index_path
+        self.mapping_path = mapping_path
+        self.model_name = model_name
+        self.embedding_cache = EmbeddingCache(cache_size, cache_path, model_name)
+
+        self.index = None
+        self.mapping = None
+        self.lexical = None
+        self.model = None
+        # (index, mapping, lexical) swapped atomically on reload
+        self._resources = None
+        self._signature = None
+        self._last_check = 0.0
+
+        self._load_lock = threading.Lock()
+        # The HF tokenizer behind SentenceTransformer is not safe to share
+        # between threads, so encoding is serialized. FAISS searches on a
+        # read-only index can run concurrently.
+        self._encode_lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def load(self):
+        """Load index, mapping and model once. Safe to call repeatedly."""
+        if self._ready.is_set():
+            return self
+        with self._load_lock:
+            if self._ready.is_set():
+                return self
+            signature = self._resource_signature()
+            index, mapping = load_resources(self.index_path, self.mapping_path)
+            lexical = load_lexical_index(self.index_path)
+
+            logger.info("Loading model %s...", self.model_name)
+            self.model = SentenceTransformer(self.model_name)
+
+            self._set_resources(index, mapping, lexical, signature)
+            self._ready.set()
+        return self
+
+    def refresh(self, force=False):
+        """
+        Reload the index and mapping if either file changed on disk, e.g.
+        after vectorize_reviews.upsert_places. The model stays loaded.
+        Returns True when new resources were swapped in.
+        """
+        if not self._ready.is_set():
+            return False
+        now = time.monotonic()
+        if not force and now - self._last_check < INDEX_RELOAD_INTERVAL:
+            return False
+        self._last_check = now
+        try:
+            signature = self._resource_signature()
+        except OSError:
+            return False
+        if signature == self._signature:
+            return False
+
+        with self._load_lock:
+            if signature == self._signature:
+                return False
+            index, mapping = load_resources(self.index_path, self.mapping_path)
+            lexical = load_lexical_index(self.index_path)
+            self._set_resources(index, mapping, lexical, signature)
+        logger.info("Reloaded location index with %d vectors", index.ntotal)
+        return True
+
+    def _resource_signature(self):
+        paths = [self.index_path, self.mapping_path]
+        for path in (columnar_mapping_path(self.mapping_path), lexical_index_path(self.index_path)):
+            if os.path.exists(path):
+                paths.append(path)
+        return tuple(os.stat(path).st_mtime_ns for path in paths)
+
+    def _set_resources(self, index, mapping, lexical, signature):
+        self._resources = (index, mapping, lexical)
+        self.index, self.mapping, self.lexical = index, mapping, lexical
+        self._signature = signature
+
+    def is_ready(self):
+        """Return True once all resources are loaded."""
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout=None):
+        """Block until the engine is loaded or the timeout expires."""
+        return self._ready.wait(timeout)
+
+    def encode(self, query):
+        """Encode a query into a float32 vector matching the index metric."""
+        return self.encode_batch([query])[0]
+
+    def encode_batch(self, queries):
+        """
+        Encode a list of queries, shape (n, d). Cached embeddings are reused
+        and the remaining queries are encoded in one model call.
+        """
+        self.load()
+        cached = [self.embedding_cache.get(query) for query in queries]
+        missing = list(dict.fromkeys(
+            normalize_query(query) for query, vector in zip(queries, cached) if vector is None
+        ))
+        if missing:
+            with self._encode_lock, timed("encode"):
+                encoded = self.model.encode(missing).astype(np.float32)
+            for text, vector in zip(missing, encoded):
+                self.embedding_cache.put(text, vector)
+            fresh = dict(zip(missing, encoded))
+            cached = [vector if vector is not None else fresh[normalize_query(query)]
+                      for query, vector in zip(queries, cached)]
+
+        query_vectors = np.stack(cached).astype(np.float32)
+
+        # Inner product indexes are built over normalized vectors (cosine)
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            faiss.normalize_L2(query_vectors)
+        return query_vectors
+
+    def similarity(self, score):
+        """
+        Cosine similarity of a hit from a vector search. The model's
+        embeddings are unit length, so the squared distance d of an L2
+        index corresponds to a similarity of 1 - d / 2.
+        """
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return score
+        return 1.0 - score / 2.0
+
+    def stats(self):
+        """Return embedding cache counters."""
+        return {"embedding_cache": self.embedding_cache.stats()}
+
+    def search(self, query, top_k=5, mode=None):
+        """
+        Search for locations similar to the query
+
+        Parameters:
+        -----------
+        query : str
+            User query text
+        top_k : int
+            Number of results to return
+        mode : str, optional
+            'hybrid' or 'vector', defaults to SEARCH_MODE
+
+        Returns:
+        --------
+        results : list
+            List of dictionaries with search results
+        """
+        return self.search_batch([query], top_k, mode)[0]
+
+    def search_batch(self, queries, top_k=5, mode=None):
+        """
+        Search for several queries with one encode call and one FAISS search
+
+        Parameters:
+        -----------
+        queries : list of str
+            User query texts
+        top_k : int
+            Number of results to return per query
+        mode : str, optional
+            'hybrid' fuses BM25 and vector rankings with reciprocal rank
+            fusion (scores are then fused, higher is better); 'vector' returns
+            raw FAISS distances. Defaults to SEARCH_MODE.
+
+        Returns:
+        --------
+        results : list of list
+            Ranked results for each query, in the order of ``queries``
+        """
+        if not queries:
+            return []
+        return self.search_vectors(queries, self.encode_batch(queries), top_k, mode)
+
+    def search_vectors(self, queries, query_vectors, top_k=5, mode=None):
+        """Search with already encoded queries, see search_batch."""
+        self.refresh()
+        index, mapping, lexical = self._resources
+        with timed("index_search"):
+            if (mode or SEARCH_MODE) == 'hybrid' and lexical is not None:
+                distances, indices = self._hybrid_search(index, lexical, queries, query_vectors, top_k)
+            else:
+                distances, indices = index.search(query_vectors, top_k)
+        return self._build_results(mapping, distances, indices)
+
+    def _hybrid_search(self, index, lexical, queries, query_vectors, top_k):
+        """Reciprocal rank fusion of the FAISS and BM25 rankings."""
+        n_candidates = min(max(top_k, HYBRID_CANDIDATES), index.ntotal)
+        _, vector_ids = index.search(query_vectors, n_candidates)
+
+        fused_scores = np.zeros((len(queries), top_k), dtype=np.float32)
+        fused_ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        for q, query in enumerate(queries):
+            lexical_ids, _ = lexical.search(query, n_candidates)
+            scores = {}
+            for ranking in (vector_ids[q].tolist(), lexical_ids.tolist()):
+                for rank, doc_id in enumerate(ranking):
+                    if doc_id != -1:
+                        scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            for j, (doc_id, score) in enumerate(best):
+                fused_ids[q, j] = doc_id
+                fused_scores[q, j] = score
+        return fused_scores, fused_ids
+
+    def search_nearby(self, query, lat, lng, radius_km, top_k=5):
+        """
+        Search for the top_k locations similar to the query within
+        ``radius_km`` of (lat, lng)
+
+        Candidates are taken from the geo grid first and passed to FAISS as
+        an id selector, so only places inside the radius are scored.
+        Each result also carries its ``distance_km``.
+        """
+        query_vector = self.encode_batch([query])
+        self.refresh()
+        index, mapping, _ = self._resources
+        if mapping.geo is None:
+            raise ValueError("Mapping has no coordinates; rebuild it with vectorize_reviews.main()")
+
+        rows, distances_km = mapping.geo.query_radius(lat, lng, radius_km)
+        if len(rows) == 0:
+            return []
+        candidate_ids = np.ascontiguousarray(mapping.ids[rows], dtype=np.int64)
+        selector = faiss.IDSelectorBatch(candidate_ids)
+        params = _search_parameters(index, selector)
+
+        k = min(top_k, len(candidate_ids))
+        distances, indices = index.search(query_vector, k, params=params)
+        results = self._build_results(mapping, distances, indices)[0]
+
+        distance_of_id = dict(zip(candidate_ids.tolist(), distances_km.tolist()))
+        for result in results:
+            result['distance_km'] = distance_of_id[result['index']]
+        return results
+
+    def _build_results(self, mapping, distances, indices):
+        # Resolve every hit of every query in one vectorized lookup.
+        # FAISS returns -1 if fewer than k results are found, and ids can be
+        # missing briefly while the mapping catches up with the index.
+        rows = mapping.lookup(indices)
+        valid = rows >= 0
+        safe_rows = np.where(valid, rows, 0)
+        titles = mapping.columns['title'][safe_rows].tolist() if 'title' in mapping else None
+        place_ids = mapping.columns['place_id'][safe_rows].tolist() if 'place_id' in mapping else None
+        geo_columns = {col: mapping.columns[col][safe_rows].tolist()
+                       for col in ('latitude', 'longitude') if col in mapping}
+        scores, ids = distances.tolist(), indices.tolist()
+
+        all_results = []
+        for q in range(len(indices)):
+            results = []
+            for j in range(len(indices[q])):
+                if not valid[q, j]:
+                    continue
+
+                result = {
+                    'rank': len(results) + 1,
+                    'score': scores[q][j],
+                    'index': ids[q][j]
+                }
+
+                # Add title and other available information
+                if titles is not None:
+                    result['title'] = titles[q][j]
+
+                if place_ids is not None:
+                    result['place_id'] = place_ids[q][j]
+
+                # Add geospatial information if available
+                for geo_col, values in geo_columns.items():
+                    result[geo_col] = values[q][j]
+
+                results.append(result)
+            all_results.append(results)
+
+        return all_results
+
+
+def _search_parameters(index, selector):
+    """Build search parameters carrying ``selector`` for the index type."""
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(base, faiss.IndexIVF):
+        # Candidates can sit in any list; the selector skips the rest cheaply
+        return faiss.SearchParametersIVF(sel=selector, nprobe=base.nlist)
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+# One engine per (index, mapping, model) combination, shared by the API,
+# the crew tools and the CLI.
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(index_path=DEFAULT_INDEX_PATH,
+               mapping_path=DEFAULT_MAPPING_PATH,
+               model_name=DEFAULT_MODEL_NAME):
+    """Return the shared engine for the given resources, creating it if needed."""
+    key = (os.path.abspath(index_path), os.path.abspath(mapping_path), model_name)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = LocationSearchEngine(*key, cache_path=EMBEDDING_CACHE_PATH)
+            _engines[key] = engine
+    return engine
+
+
+def warm_up():
+    """Load the default engine. Called from the API startup hook."""
+    return get_engine().load()
@@ -1,19 +1,38 @@
+import os
 import time
-from datetime import datetime, timedelta
-from fastapi import FastAPI, Body, Depends, HTTPException, status
+import asyncio
+import json
+import base64
+import logging
+from datetime import datetime, timedelta, timezone
+from fastapi import FastAPI, Body, Depends, HTTPException, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy import and_, or_, insert
 from sqlalchemy.orm import Session
 
-from crew.chatbot import process_user_query
-from models import ChatSession, User, ChatHistory, UserCreate, UserResponse, Token, SessionLocal
-from auth import get_password_hash, authenticate_user, create_access_token, get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES
+from crew.chatbot import process_user_query, conversation_memory, response_cache, crew_pool
+from crew.get_locations import get_location
+from search_engine import get_engine, warm_up
+from concurrency import BoundedExecutor, ExecutorSaturated, SingleFlight
+from embedding_cache import normalize_query
+from models import ChatSession, User, ChatHistory, UserCreate, UserResponse, Token, SessionLocal, engine
+from metrics import registry, instrument_engine, HTTP_REQUEST_SECONDS
+from auth import hash_password, authenticate_user_async, create_access_token, get_current_active_user, get_optional_current_user, user_cache, ACCESS_TOKEN_EXPIRE_MINUTES
 
 # Import admin routes after all dependencies are defined
 from admin import router
 
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Locations API", description="API providing locations coordinates data")
 
 # Include admin routes
@@ -37,40 +56,248 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Chat queries block on the LLM, so they run on a bounded pool instead
+# of the event loop
+chat_executor = BoundedExecutor(name="chat")
+# Identical queries arriving together share one crew run
+chat_flights = SingleFlight()
+
+# Per-stage timings come from the metrics module; add DB statement timings
+# and a few gauges read at scrape time
+instrument_engine(engine)
+registry.callback("locations_chat_pool_running", "Chat queries running on the worker pool",
+                  lambda: chat_executor.stats()["running"])
+registry.callback("locations_chat_pool_queued", "Chat queries waiting for a worker",
+                  lambda: chat_executor.stats()["queued"])
+registry.callback("locations_chat_rejected_total", "Chat queries rejected or timed out by the worker pool",
+                  lambda: chat_executor.stats()["rejected"] + chat_executor.stats()["timed_out"], "counter")
+registry.callback("locations_chat_coalesced_total", "Chat queries served by an identical in-flight query",
+                  lambda: chat_flights.coalesced, "counter")
+registry.callback("locations_response_cache_hits_total", "Chatbot answers served from the response cache",
+                  lambda: response_cache.hits, "counter")
+registry.callback("locations_embedding_cache_hits_total", "Query embeddings served from the cache",
+                  lambda: get_engine().embedding_cache.hits, "counter")
+registry.callback("locations_auth_user_cache_hits_total", "Authenticated requests resolved without a user lookup",
+                  lambda: user_cache.hits, "counter")
+
+def observe_request_latency(request, start, status_code):
+    # Label by route template, not raw path, to keep label sets bounded
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=route.path if route is not None else "unmatched",
+        status=status_code
+    )
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        observe_request_latency(request, start, 500)
+        raise
+
+    # call_next returns once the headers are ready; stop the clock when the
+    # body has been sent, so streamed responses such as /locations/stream
+    # are timed in full
+    body_iterator = response.body_iterator
+
+    async def timed_body():
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            observe_request_latency(request, start, response.status_code)
+
+    response.body_iterator = timed_body()
+    return response
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Per-stage latency histograms, HTTP and database timings and pool
+    gauges in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# Kept so the background load is not garbage collected and its failure is logged
+search_engine_loading = None
+
+def log_load_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Loading the search engine failed: %s", future.exception())
+
+@app.on_event("startup")
+async def load_search_engine():
+    """
+    Start loading the FAISS index, mapping and embedding model in the
+    background, so the server accepts connections (and /ready answers 503)
+    while it loads.
+    """
+    global search_engine_loading
+    search_engine_loading = asyncio.get_running_loop().run_in_executor(None, warm_up)
+    search_engine_loading.add_done_callback(log_load_failure)
+
+@app.get("/ready")
+async def readiness():
+    """
+    Readiness probe. Returns 503 until the location search engine is loaded.
+    """
+    if not get_engine().is_ready():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Search engine is loading")
+    return {"status": "ready"}
+
+@app.on_event("shutdown")
+def stop_chat_executor():
+    chat_executor.shutdown(wait=False)
+
+def load_session_context(session_id, limit):
+    """Rebuild a chat session's recent conversation from the chat_history table."""
+    db = SessionLocal()
+    try:
+        rows = db.query(ChatHistory)\
+            .filter(ChatHistory.session_id == session_id)\
+            .order_by(ChatHistory.timestamp.desc())\
+            .limit((limit + 1) // 2)\
+            .all()
+    finally:
+        db.close()
+    lines = []
+    for row in reversed(rows):
+        lines.append(f"User: {row.message}")
+        lines.append(f"Assistant: {row.response}")
+    return lines[-limit:]
+
+conversation_memory.loader = load_session_context
+
 class CityRequest(BaseModel):
     input_string: str
+    session_id: Optional[int] = None  # Chat session whose context should be used
+
+def owned_session_id(request, current_user, db):
+    """The request's session id if it belongs to the authenticated caller, else None."""
+    if request.session_id is None or current_user is None:
+        return None
+    owned = db.query(ChatSession.id)\
+        .filter(ChatSession.id == request.session_id, ChatSession.user_id == current_user.id)\
+        .first()
+    return request.session_id if owned else None
+
+def format_result(result):
+    """Wrap a chatbot result in the {"type", "content"} envelope the frontend expects."""
+    if isinstance(result, str):
+        return {"type": "text", "content": result}
+    elif isinstance(result, (list, dict)):
+        return {"type": "json", "content": result}
+    else:
+        return {"type": "error", "content": "Unexpected response type"}
+
+async def run_chat_query(input_string, session_id):
+    """Process a query on the chat pool, coalescing identical concurrent requests."""
+    key = (session_id, normalize_query(input_string))
+    return await chat_flights.run(key, chat_executor.run, process_user_query, input_string, session_id)
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
     
 @app.post("/locations")
-async def get_cities(request: CityRequest = Body(...)):
+async def get_cities(
+    request: CityRequest = Body(...),
+    current_user: Optional[User] = Depends(get_optional_current_user),
+    db: Session = Depends(get_db)
+):
     """
     Returns cities data or a string based on the processed query.
     
     Takes a long string as input. The response type can be either:
     - A list of dictionaries with city information
     - A string response
+
+    Conversation context is kept per chat session, and only when the
+    session belongs to the authenticated caller. Queries run on a bounded
+    worker pool; when it is saturated the endpoint answers 429 (queue
+    full) or 503 (waited too long) with a Retry-After header.
     """
     try:
         # Log or process the input_string if needed
-        print(f"Received input string: {request.input_string[:100]}...")  # Print first 100 chars
+        logger.info("Received input string: %s...", request.input_string[:100])  # First 100 chars
+
+        session_id = owned_session_id(request, current_user, db)
         
         # Get the response
-        result = process_user_query(request.input_string)
-        print(f"Processed result: {result[:100]}...")  # Print first 100 chars of result
+        result = await run_chat_query(request.input_string, session_id)
+        logger.debug("Processed result: %s...", str(result)[:100])  # First 100 chars of result
         
         # Check the type of result and return appropriate response
-        if isinstance(result, str):
-            return {"type": "text", "content": result}
-        elif isinstance(result, (list, dict)):
-            return {"type": "json", "content": result}
-        else:
-            return {"type": "error", "content": "Unexpected response type"}
-        # return [{'rank': 1, 'score': 1.221296787261963, 'index': 11, 'title': 'Aditya Shagun Mall', 'place_id': 'ChIJL9wRPVm-wjsRcD1BYTfcW_E'}, {'rank': 2, 'score': 1.247261881828308, 'index': 6, 'title': 'Royale Heritage Mall', 'place_id': 'ChIJndd_RLvrwjsRx5LWxbkYYH8'}, {'rank': 3, 'score': 1.3079421520233154, 'index': 21, 'title': 'ISKCON NVCC Pune', 'place_id': 'ChIJSdctqfvqwjsR7tcJvlsbul4'}, {'rank': 4, 'score': 1.314194917678833, 'index': 15, 'title': 'Piazza Pizza By Little Italy SGS Mall', 'place_id': 'ChIJ0wMQ-U_AwjsRsuEOeqz4KPc'}, {'rank': 5, 'score': 1.3251968622207642, 'index': 2, 'title': 'Seasons Mall', 'place_id': 'ChIJ41PwQ_LBwjsRypeqtFw7peY'}]
+        return format_result(result)
             
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         return {"type": "error", "content": str(e)}
 
 
+@app.post("/locations/stream")
+async def stream_cities(
+    request: CityRequest = Body(...),
+    current_user: Optional[User] = Depends(get_optional_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Streaming variant of POST /locations, as Server-Sent Events.
+
+    Events, in order:
+    - suggestions: raw location search results, available long before the LLM answers
+    - result: the final response, in the same {"type", "content"} format as /locations
+    - error: {"content", "status", "retry_after"} if processing failed or the pool is saturated
+    - done: always sent last
+    """
+    logger.info("Received streaming input string: %s...", request.input_string[:100])
+    session_id = owned_session_id(request, current_user, db)
+
+    async def events():
+        try:
+            suggestions = await run_in_threadpool(get_location, request.input_string)
+            yield sse_event("suggestions", suggestions)
+        except Exception as e:
+            # The LLM answer can still be produced without the quick results
+            logger.warning("Location search failed for stream: %s", e)
+
+        try:
+            result = await run_chat_query(request.input_string, session_id)
+            yield sse_event("result", format_result(result))
+        except ExecutorSaturated as e:
+            yield sse_event("error", {"content": str(e), "status": e.status_code, "retry_after": e.retry_after})
+        except Exception as e:
+            yield sse_event("error", {"content": str(e), "status": 500, "retry_after": None})
+        yield sse_event("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/locations/stats")
+async def locations_stats():
+    """
+    Load of the chat worker pool: running and queued requests, rejections
+    and queue-wait / service time percentiles, plus response cache hit
+    rate, the LLM time it saved and how many requests were coalesced.
+    """
+    stats = chat_executor.stats()
+    stats["response_cache"] = response_cache.stats()
+    stats["coalescing"] = chat_flights.stats()
+    stats["crew_pool"] = crew_pool.stats()
+    return stats
+
+
 @app.get("/")
 async def root():
     """
@@ -95,7 +322,7 @@ async def signup(user: UserCreate, db: Session = Depends(get_db)):
             return {"success": True, "message": "Email already registered"}
         
         # Create new user
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await hash_password(user.password)
         db_user = User(
             username=user.email,
             email=user.email,
@@ -105,6 +332,9 @@ async def signup(user: UserCreate, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(db_user)
         return {"success": True, "message": "Registration successful"}
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         return {"success": False, "message": str(e)}
 
@@ -118,8 +348,8 @@ async def login_for_access_token(
     db: Session = Depends(get_db)
 ):
     try:
-        print(f"Attempting to authenticate user: {credentials.password}")
-        user = authenticate_user(db, credentials.email, credentials.password)
+        logger.info("Attempting to authenticate user: %s", credentials.email)
+        user = await authenticate_user_async(db, credentials.email, credentials.password)
         if not user:
             return {
                 "success": False,
@@ -138,6 +368,9 @@ async def login_for_access_token(
                 "token_type": "bearer"
             }
         }
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         return {"success": False, "message": str(e)}
 
@@ -145,6 +378,44 @@ async def login_for_access_token(
 async def read_users_me(current_user: User = Depends(get_current_active_user)):
     return current_user
 
+# Keyset pagination: the cursor is the (timestamp, id) of the last row of
+# the previous page, opaque to clients; the next one is sent in X-Next-Cursor
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(timestamp, row_id):
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def after_cursor(timestamp_column, id_column, cursor, descending=False):
+    """Filter for rows that come after ``cursor`` in (timestamp, id) order."""
+    timestamp, row_id = decode_cursor(cursor)
+    if descending:
+        return or_(timestamp_column < timestamp, and_(timestamp_column == timestamp, id_column < row_id))
+    return or_(timestamp_column > timestamp, and_(timestamp_column == timestamp, id_column > row_id))
+
+def paginate(query, limit, response, timestamp_attr):
+    """
+    Return one page of ``query`` (already ordered and filtered by cursor)
+    and set X-Next-Cursor when more rows follow. Without a limit every
+    row is returned, as before pagination existed.
+    """
+    if limit is None:
+        return query.all()
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(getattr(last, timestamp_attr), last.id)
+    return rows
+
 # Chat session endpoints
 class ChatSessionCreate(BaseModel):
     topic: str = None
@@ -166,14 +437,23 @@ async def create_chat_session(
 
 @app.get("/chat/sessions")
 async def get_chat_sessions(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    sessions = db.query(ChatSession)\
-        .filter(ChatSession.user_id == current_user.id)\
-        .order_by(ChatSession.last_updated.desc())\
-        .all()
-    return sessions
+    """
+    The user's chat sessions, most recently updated first. Pass ``limit``
+    to page through them; the cursor for the next page is returned in
+    the X-Next-Cursor header.
+    """
+    query = db.query(ChatSession)\
+        .filter(ChatSession.user_id == current_user.id)
+    if cursor:
+        query = query.filter(after_cursor(ChatSession.last_updated, ChatSession.id, cursor, descending=True))
+    query = query.order_by(ChatSession.last_updated.desc(), ChatSession.id.desc())
+    return paginate(query, limit, response, "last_updated")
 
 @app.get("/chat/sessions/{session_id}")
 async def get_chat_session(
@@ -222,12 +502,88 @@ async def save_chat_history(
     db.refresh(chat_history)
     return {"status": "success", "message": "Chat history saved"}
 
+# Bulk ingestion for offline sync and replay clients
+CHAT_HISTORY_BATCH_MAX = int(os.getenv("CHAT_HISTORY_BATCH_MAX", "1000"))
+
+class ChatMessageBatchItem(ChatMessageCreate):
+    timestamp: Optional[datetime] = None  # When the exchange happened; defaults to now
+
+    @field_validator("timestamp")
+    @classmethod
+    def to_naive_utc(cls, value):
+        # Stored timestamps are naive UTC (datetime.utcnow), so convert
+        # offsets instead of dropping them
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+class ChatHistoryBatch(BaseModel):
+    messages: List[ChatMessageBatchItem] = Field(..., min_length=1, max_length=CHAT_HISTORY_BATCH_MAX)
+
+@app.post("/chat/history/batch")
+async def save_chat_history_batch(
+    batch: ChatHistoryBatch,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Save many messages, for one or more sessions, in one transaction.
+
+    Session ownership is checked with a single query and the whole batch
+    is rejected if any session is missing or belongs to someone else.
+    Rows are inserted with one executemany and each session's
+    last_updated is bumped once.
+    """
+    session_ids = {item.session_id for item in batch.messages}
+    owned = {
+        row.id for row in db.query(ChatSession.id)
+        .filter(ChatSession.id.in_(session_ids), ChatSession.user_id == current_user.id)
+    }
+    missing = session_ids - owned
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Chat session not found: {sorted(missing)}")
+
+    now = datetime.utcnow()
+    try:
+        db.execute(insert(ChatHistory), [
+            {
+                "session_id": item.session_id,
+                "user_id": current_user.id,
+                "message": item.message,
+                "response": item.response,
+                "response_type": item.response_type,
+                "timestamp": item.timestamp or now,
+            }
+            for item in batch.messages
+        ])
+        db.query(ChatSession)\
+            .filter(ChatSession.id.in_(session_ids))\
+            .update({ChatSession.last_updated: now}, synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {
+        "status": "success",
+        "message": f"Saved {len(batch.messages)} chat messages",
+        "saved": len(batch.messages),
+        "sessions": len(session_ids),
+    }
+
 @app.get("/chat/history/{session_id}")
 async def get_chat_history(
     session_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    """
+    Messages of a chat session, oldest first. Pass ``limit`` to page
+    through them; the cursor for the next page is returned in the
+    X-Next-Cursor header.
+    """
     # Verify session exists and belongs to user
     session = db.query(ChatSession)\
         .filter(ChatSession.id == session_id, ChatSession.user_id == current_user.id)\
@@ -235,14 +591,15 @@ async def get_chat_history(
     if not session:
         raise HTTPException(status_code=404, detail="Chat session not found")
     
-    chat_history = db.query(ChatHistory)\
+    query = db.query(ChatHistory)\
         .filter(
             ChatHistory.session_id == session_id,
             ChatHistory.user_id == current_user.id
-        )\
-        .order_by(ChatHistory.timestamp.asc())\
-        .all()
-    return chat_history
+        )
+    if cursor:
+        query = query.filter(after_cursor(ChatHistory.timestamp, ChatHistory.id, cursor))
+    query = query.order_by(ChatHistory.timestamp.asc(), ChatHistory.id.asc())
+    return paginate(query, limit, response, "timestamp")
 
 if __name__ == "__main__":
     import uvicorn